@@ -0,0 +1,353 @@
+"""Headless HTTP API for the calculator, tips and chat assistant.
+
+Usage:
+    python api_server.py --port 8600 --workers 4
+
+Endpoints (POST bodies and responses are JSON, or MessagePack when the
+request sends Content-Type / Accept: application/msgpack and the optional
+msgpack package is installed):
+
+    GET  /healthz              status and the factor-set version in use
+    GET  /metrics              Prometheus metrics for the worker that answers
+    POST /v1/footprint         one set of Calculator inputs -> results
+    POST /v1/footprint/batch   {"rows": [inputs, ...]} or
+                               {"columns": {field: [values, ...]}} -> results
+                               for all of them in one vectorized pass
+    POST /v1/tips              inputs (+ optional "top") -> ranked what-if tips
+    POST /v1/chat              {"messages": [{"role", "content"}, ...],
+                               "inputs": optional Calculator inputs} -> reply
+
+Inputs use the field names in carbon_engine.INPUT_COLUMNS, with country,
+transportation_mode and diet_type given as labels from the factor table.
+Connections are kept alive between requests; run several --workers to use
+every core (the memory-mapped factor table is shared between them).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+from assistant import FALLBACK_RESPONSE, grounded_prompt, offline_reply
+from carbon_engine import FACTORS, INPUT_COLUMNS, RESULT_COLUMNS, calculate_batch, calculate_footprint
+from chat_context import ConversationWindow
+from content import REDUCTION_TIPS
+from factor_table import CATEGORIES
+from metrics import CALCULATION_SECONDS, CALCULATIONS, CHAT_FALLBACKS, CONTENT_TYPE, METRICS
+from response_cache import ResponseCache, make_key
+from scenarios import ScenarioSweep
+from session_model import FootprintResult
+
+try:
+    import msgpack
+except ImportError:  # MessagePack is optional; JSON is always available
+    msgpack = None
+
+logger = logging.getLogger("carbon_calculator.api")
+
+MSGPACK = "application/msgpack"
+
+# Largest batch accepted in one request
+MAX_BATCH_ROWS = int(os.environ.get("CARBON_CALC_API_MAX_BATCH", 100_000))
+
+_NUMERIC_FIELDS = ("distance", "electricity", "meals", "waste", "household_size")
+
+# Label fields and the factor-table encoder each must be a label of
+_LABEL_FIELDS = (("country", "countries"), ("transportation_mode", "modes"), ("diet_type", "diets"))
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _wants_msgpack(request):
+    return msgpack is not None and MSGPACK in request.headers.get("accept", "")
+
+
+def encode(request, payload, status_code=200):
+    if _wants_msgpack(request):
+        return Response(msgpack.packb(payload), status_code, media_type=MSGPACK)
+    return Response(json.dumps(payload, separators=(",", ":")), status_code, media_type="application/json")
+
+
+async def decode(request):
+    body = await request.body()
+    use_msgpack = request.headers.get("content-type", "").startswith(MSGPACK)
+    if use_msgpack and msgpack is None:
+        raise BadRequest("MessagePack support is not installed; send JSON")
+    try:
+        data = msgpack.unpackb(body) if use_msgpack else json.loads(body)
+    except (ValueError, TypeError) as e:
+        raise BadRequest(f"Malformed request body: {e}")
+    if not isinstance(data, dict):
+        raise BadRequest("Request body must be an object")
+    return data
+
+
+def _is_number(value):
+    # JSON allows NaN and Infinity, which would only come back out as NaN results
+    return type(value) in (int, float) and math.isfinite(value)
+
+
+def _is_label(value, encoder):
+    # Strings only: the engine would take an integer as a raw code, and a list isn't hashable
+    return type(value) is str and value in encoder.ids
+
+
+def parse_inputs(data, table=None):
+    missing = [field for field in INPUT_COLUMNS if field not in data]
+    if missing:
+        raise BadRequest(f"Missing fields: {', '.join(missing)}")
+    inputs = {field: data[field] for field in INPUT_COLUMNS}
+    for field in _NUMERIC_FIELDS:
+        if not _is_number(inputs[field]):
+            raise BadRequest(f"{field} must be a number")
+    if inputs["household_size"] <= 0:
+        raise BadRequest("household_size must be positive")
+    table = table or FACTORS.table
+    for field, attribute in _LABEL_FIELDS:
+        if not _is_label(inputs[field], getattr(table, attribute)):
+            raise BadRequest(f"Unknown {field}: {inputs[field]!r}")
+    return inputs
+
+
+def check_batch(columns, table=None):
+    """The parse_inputs checks, applied to every row of a batch's columns."""
+    for field in INPUT_COLUMNS:
+        values = columns[field]
+        if None in values:
+            raise BadRequest(f"Row {values.index(None)} is missing {field}")
+    table = table or FACTORS.table
+    for field, attribute in _LABEL_FIELDS:
+        values, encoder = columns[field], getattr(table, attribute)
+        if not all(_is_label(value, encoder) for value in values):
+            row = next(i for i, value in enumerate(values) if not _is_label(value, encoder))
+            raise BadRequest(f"Row {row}: unknown {field}: {values[row]!r}")
+    for field in _NUMERIC_FIELDS:
+        values = columns[field]
+        if not all(map(_is_number, values)):
+            row = next(i for i, value in enumerate(values) if not _is_number(value))
+            raise BadRequest(f"Row {row}: {field} must be a number")
+    household_size = np.asarray(columns["household_size"], dtype=np.float64)
+    if household_size.size and household_size.min() <= 0:
+        raise BadRequest(f"Row {int(np.argmax(household_size <= 0))}: household_size must be positive")
+
+
+def handler(endpoint):
+    """Wrap an endpoint so BadRequest becomes a 400 in the client's format."""
+    async def wrapped(request):
+        try:
+            return encode(request, await endpoint(request))
+        except BadRequest as e:
+            return encode(request, {"error": str(e)}, 400)
+    return wrapped
+
+
+async def health(request):
+    return {"status": "ok", "factors_version": FACTORS.table.version}
+
+
+async def metrics(request):
+    return PlainTextResponse(METRICS.render(), media_type=CONTENT_TYPE)
+
+
+async def footprint(request):
+    inputs = parse_inputs(await decode(request))
+    with CALCULATION_SECONDS.labels("api").time():
+        results = calculate_footprint(**inputs)
+    if not math.isfinite(results["total_emissions"]):
+        raise BadRequest("Inputs do not give a finite footprint")
+    CALCULATIONS.labels("api").inc()
+    return results
+
+
+async def footprint_batch(request):
+    data = await decode(request)
+    if "rows" in data:
+        rows = data["rows"]
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise BadRequest("rows must be a list of objects")
+        columns = {field: [row.get(field) for row in rows] for field in INPUT_COLUMNS}
+    elif "columns" in data:
+        columns = data["columns"]
+        if not isinstance(columns, dict) or not all(isinstance(values, list) for values in columns.values()):
+            raise BadRequest("columns must map field names to lists")
+        missing = [field for field in INPUT_COLUMNS if field not in columns]
+        if missing:
+            raise BadRequest(f"Missing columns: {', '.join(missing)}")
+    else:
+        raise BadRequest("Send either rows or columns")
+    lengths = {len(columns[field]) for field in INPUT_COLUMNS}
+    if len(lengths) != 1:
+        raise BadRequest("All columns must have the same length")
+    if lengths.pop() > MAX_BATCH_ROWS:
+        raise BadRequest(f"Batches are limited to {MAX_BATCH_ROWS} rows")
+    # One table for checking and scoring, so a hot swap in between can't matter
+    table = FACTORS.table
+    check_batch(columns, table)
+
+    try:
+        # Overflowing rows are reported below rather than warned about
+        with CALCULATION_SECONDS.labels("api_batch").time(), np.errstate(over="ignore", invalid="ignore"):
+            results = calculate_batch(*(columns[field] for field in INPUT_COLUMNS), table=table)
+    except KeyError as e:
+        raise BadRequest(f"Unknown label: {e.args[0]}")
+    except (ValueError, TypeError) as e:
+        raise BadRequest(f"Invalid batch: {e}")
+    finite = np.isfinite(results["total_emissions"])
+    if not finite.all():
+        raise BadRequest(f"Row {int(np.argmin(finite))} does not give a finite footprint")
+
+    CALCULATIONS.labels("api_batch").inc(len(results["total_emissions"]))
+
+    output = {column: results[column].tolist() for column in RESULT_COLUMNS}
+    output["highest_category"] = np.asarray(CATEGORIES, dtype=object)[results["highest_category"]].tolist()
+    if "rows" in data:
+        # Row in, rows out
+        keys = list(output)
+        output = {"results": [dict(zip(keys, values)) for values in zip(*output.values())]}
+    else:
+        output = {"results": output}
+    output["factors_version"] = results["factors_version"]
+    return output
+
+
+def _ranked_tips(inputs, top=None):
+    sweep = ScenarioSweep(**inputs)
+    # The lever change is an internal grid index; clients get the rest
+    return [{key: value for key, value in tip.items() if key != "change"} for tip in sweep.tips(top)]
+
+
+async def tips(request):
+    data = await decode(request)
+    inputs = parse_inputs(data)
+    top = data.get("top", 5)
+    if top is not None and (isinstance(top, bool) or not isinstance(top, int) or top < 0):
+        raise BadRequest("top must be a non-negative integer")
+    results = calculate_footprint(**inputs)
+    return {
+        "tips": _ranked_tips(inputs, top),
+        "category_tips": REDUCTION_TIPS[results["highest_category"]],
+        "highest_category": results["highest_category"],
+        "factors_version": results["factors_version"]
+    }
+
+
+async def chat(request):
+    data = await decode(request)
+    messages = data.get("messages")
+    if not isinstance(messages, list) or not messages or not all(
+            isinstance(m, dict) and m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)
+            for m in messages):
+        raise BadRequest("messages must be a non-empty list of {role, content} objects")
+    if messages[-1]["role"] != "user":
+        raise BadRequest("The last message must be from the user")
+
+    footprint, savings = None, []
+    if data.get("inputs") is not None:
+        inputs = parse_inputs(data["inputs"])
+        footprint = FootprintResult.from_results(calculate_footprint(**inputs), inputs["country"])
+        savings = ScenarioSweep(**inputs).tips()
+    user_data = footprint.to_user_data() if footprint is not None else {"calculated": False}
+
+    gateway = request.app.state.gateway
+    if gateway is None:
+        CHAT_FALLBACKS.labels("offline").inc()
+        return {"reply": offline_reply(messages[-1]["content"], footprint, savings), "source": "offline"}
+
+    answer, system_content = grounded_prompt(messages, user_data)
+    if answer is not None:
+        return {"reply": answer, "source": "knowledge"}
+
+    # The response cache is optional; without one every question goes upstream
+    cache = request.app.state.response_cache
+    cache_key = make_key(messages, user_data) if cache is not None else None
+    cached = cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        return {"reply": cached, "source": "cache"}
+
+    # Requests are stateless, so each gets a fresh window over the history it sent
+    history = [{"id": i, "role": m["role"], "content": m["content"]} for i, m in enumerate(messages, 1)]
+    formatted = ConversationWindow().build(system_content, history)
+    try:
+        response = await asyncio.wrap_future(gateway.submit(formatted))
+    except Exception:
+        logger.exception("LLM call failed; using the fallback reply")
+        CHAT_FALLBACKS.labels("error").inc()
+        return {"reply": FALLBACK_RESPONSE, "source": "fallback"}
+    if cache_key is not None and response["content"]:
+        cache.put(cache_key, response["content"], response["usage"].get("total_tokens", 0))
+    return {"reply": response["content"], "source": "llm"}
+
+
+def create_app(gateway=None, response_cache=None, lifespan=None):
+    """Build the ASGI app. Without a gateway, chat uses the offline keyword replies;
+    without a response_cache, chat replies are not cached."""
+    app = Starlette(lifespan=lifespan, routes=[
+        Route("/healthz", handler(health), methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/v1/footprint", handler(footprint), methods=["POST"]),
+        Route("/v1/footprint/batch", handler(footprint_batch), methods=["POST"]),
+        Route("/v1/tips", handler(tips), methods=["POST"]),
+        Route("/v1/chat", handler(chat), methods=["POST"])
+    ])
+    app.state.gateway = gateway
+    app.state.response_cache = response_cache
+    return app
+
+
+def app_from_env():
+    """App factory for uvicorn workers, configured like app.py from the environment."""
+    from llm_gateway import LLMGateway
+
+    load_dotenv()
+    api_key = os.environ.get("OPENAI_API_KEY")
+    gateway = None
+    response_cache = None
+    if api_key:
+        gateway = LLMGateway(
+            api_key=api_key,
+            max_concurrency=int(os.environ.get("CARBON_CALC_LLM_CONCURRENCY", 8)),
+            tokens_per_minute=int(os.environ.get("CARBON_CALC_LLM_TOKENS_PER_MINUTE", 90000))
+        )
+        response_cache = ResponseCache(
+            os.environ.get("CARBON_CALC_RESPONSE_CACHE", os.path.join(".cache", "chat_responses.sqlite3")),
+            ttl=float(os.environ.get("CARBON_CALC_RESPONSE_CACHE_TTL", 24 * 3600))
+        )
+    FACTORS.watch(float(os.environ.get("CARBON_CALC_FACTORS_POLL_SECONDS", 2.0)))
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        # On worker shutdown, stop the gateway's loop thread and close the cache database
+        if gateway is not None:
+            await asyncio.to_thread(gateway.close)
+        if response_cache is not None:
+            response_cache.close()
+
+    return create_app(gateway, response_cache, lifespan)
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the carbon calculator over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default: 1)")
+    args = parser.parse_args(argv)
+
+    uvicorn.run("api_server:app_from_env", factory=True, host=args.host, port=args.port,
+                workers=args.workers, log_level="warning", timeout_keep_alive=30)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,253 +1,242 @@
 import streamlit as st
-import pandas as pd
-import time
-from datetime import datetime
+from contextlib import closing
+import logging
 import random
+import time
 import os
-from openai import OpenAI
+import uuid
 from dotenv import load_dotenv
 
+from assistant import FALLBACK_RESPONSE, ai_response, build_result_message, grounded_prompt, offline_reply
+from chat_context import ConversationWindow
+from cohorts import CohortSketches
+from carbon_engine import FACTORS, calculate_footprint, national_average
+from content import AI_GREETINGS, APP_CSS, REDUCTION_TIPS
+from history_store import HistoryStore
+from latency import RECORDER
+from metrics import CALCULATION_SECONDS, CALCULATIONS, CHAT_FALLBACKS, METRICS
+from response_cache import ResponseCache, make_key
+from scenarios import ScenarioSweep
+from session_model import FootprintResult, MessageLog, sweep_spill_files
+from transcript import Transcript, new_message, render_message
+from uncertainty import footprint_intervals
+
 # Load environment variables
 load_dotenv()
 
-# Define emission factors (example values, replace with accurate data)
-EMISSION_FACTORS = {
-    "India": {
-        "Transportation": 0.14,  # kgCO2/km
-        "Electricity": 0.82,  # kgCO2/kWh
-        "Diet": {
-            "Vegetarian": 0.7,    # kgCO2/meal
-            "Non-vegetarian": 1.5, # kgCO2/meal
-            "Vegan": 0.5          # kgCO2/meal
-        },
-        "Waste": 0.1  # kgCO2/kg
-    },
-    "United States": {
-        "Transportation": 0.18,  # kgCO2/km
-        "Electricity": 0.42,     # kgCO2/kWh
-        "Diet": {
-            "Vegetarian": 0.8,    # kgCO2/meal
-            "Non-vegetarian": 1.8, # kgCO2/meal
-            "Vegan": 0.6          # kgCO2/meal
-        },
-        "Waste": 0.12  # kgCO2/kg
-    },
-    "European Union": {
-        "Transportation": 0.16,  # kgCO2/km
-        "Electricity": 0.28,     # kgCO2/kWh
-        "Diet": {
-            "Vegetarian": 0.75,    # kgCO2/meal
-            "Non-vegetarian": 1.6,  # kgCO2/meal
-            "Vegan": 0.55          # kgCO2/meal
-        },
-        "Waste": 0.09  # kgCO2/kg
-    }
-}
-
-# Global average for comparison
-GLOBAL_AVERAGE_EMISSIONS = {
-    "India": 1.9,
-    "United States": 15.2,
-    "European Union": 6.4
-}
-
-# Reduction tips for each category
-REDUCTION_TIPS = {
-    "Transportation": [
-        "Consider carpooling or using public transportation",
-        "Try biking or walking for short distances",
-        "If possible, work from home a few days a week",
-        "Consider an electric or hybrid vehicle for your next purchase",
-        "Combine errands to reduce trips"
-    ],
-    "Electricity": [
-        "Switch to LED bulbs throughout your home",
-        "Unplug electronics when not in use",
-        "Use energy-efficient appliances",
-        "Install solar panels if feasible",
-        "Wash clothes in cold water and air dry when possible"
-    ],
-    "Diet": [
-        "Consider incorporating more plant-based meals",
-        "Reduce food waste by planning meals carefully",
-        "Buy local and seasonal produce when possible",
-        "Limit beef consumption, as it has the highest carbon footprint",
-        "Grow some of your own vegetables if you have space"
-    ],
-    "Waste": [
-        "Compost food scraps when possible",
-        "Recycle diligently according to local guidelines",
-        "Choose products with minimal packaging",
-        "Repair items instead of replacing them",
-        "Use reusable bags, bottles, and containers"
-    ]
-}
-
-# Initial AI greeter messages
-AI_GREETINGS = [
-    "Hello! I'm your carbon footprint assistant. How can I help you today?",
-    "Welcome to the Carbon Calculator! I'm here to help you understand and reduce your carbon footprint.",
-    "Hi there! Ready to calculate your environmental impact? I'm here to assist!"
-]
+logger = logging.getLogger("carbon_calculator.app")
+
+# Stream assistant replies token by token (set CARBON_CALC_STREAMING=0 to wait for full replies)
+STREAM_RESPONSES = os.environ.get("CARBON_CALC_STREAMING", "1").lower() not in ("0", "false", "no")
+
+# Prompt tokens (system prompt, summary and history) sent with each chat request
+CHAT_TOKEN_BUDGET = int(os.environ.get("CARBON_CALC_CHAT_TOKEN_BUDGET", 2000))
+
+# Chat messages rendered per page of transcript history
+TRANSCRIPT_PAGE_SIZE = int(os.environ.get("CARBON_CALC_TRANSCRIPT_PAGE_SIZE", 50))
+
+# Chat messages kept in memory per session; older ones are spilled to disk
+MESSAGE_CAP = int(os.environ.get("CARBON_CALC_MESSAGE_CAP", 200))
+
+# Past calculations shown on the user's trend chart
+HISTORY_CHART_POINTS = int(os.environ.get("CARBON_CALC_HISTORY_CHART_POINTS", 50))
+
+# How often the emission factor file is checked for a new version
+FACTORS_POLL_SECONDS = float(os.environ.get("CARBON_CALC_FACTORS_POLL_SECONDS", 2.0))
+
+# Cohort percentile sketches built by cohorts.py; the comparison is hidden if the file is missing
+COHORTS_PATH = os.environ.get("CARBON_CALC_COHORTS", os.path.join("data", "cohorts.npz"))
+
+# Monte Carlo draws per uncertainty estimate, and the seed that keeps them stable across reruns
+UNCERTAINTY_DRAWS = int(os.environ.get("CARBON_CALC_UNCERTAINTY_DRAWS", 100_000))
+UNCERTAINTY_SEED = int(os.environ.get("CARBON_CALC_UNCERTAINTY_SEED", 0))
+
 
 # Set wide layout and page name
 st.set_page_config(layout="wide", page_title="Personal Carbon Calculator", page_icon="🌍")
 
 # Add CSS for better styling
-st.markdown("""
-    <style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #2c3e50;
-        text-align: center;
-    }
-    .sub-header {
-        font-size: 1.5rem;
-        color: #34495e;
-    }
-    .category-title {
-        font-weight: bold;
-        font-size: 1.2rem;
-    }
-    .info-box {
-        padding: 10px;
-        border-radius: 5px;
-        margin-bottom: 10px;
-    }
-    .chat-container {
-        border: 1px solid #ddd;
-        border-radius: 10px;
-        padding: 15px;
-        height: 400px;
-        overflow-y: auto;
-        background-color: #f9f9f9;
-    }
-    .user-message {
-        background-color: #dcf8c6;
-        padding: 8px 12px;
-        border-radius: 15px;
-        margin: 5px;
-        margin-left: 20%;
-        margin-right: 5px;
-        display: inline-block;
-        max-width: 80%;
-        float: right;
-        clear: both;
-    }
-    .bot-message {
-        background-color: #ffffff;
-        padding: 8px 12px;
-        border-radius: 15px;
-        margin: 5px;
-        margin-right: 20%;
-        display: inline-block;
-        max-width: 80%;
-        float: left;
-        clear: both;
-    }
-    .time-stamp {
-        font-size: 0.7rem;
-        color: #888;
-        margin-top: 2px;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Initialize OpenAI client
-def init_openai_client():
-    # Get API key from secrets or environment variables
-    api_key = st.secrets.get("OPENAI_API_KEY", os.environ.get("OPENAI_API_KEY"))
-    
-    if not api_key:
-        st.sidebar.warning("OpenAI API key not found. Please set it in your environment variables or Streamlit secrets.")
-        return None
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# One shared LLM gateway (async, connection-pooled OpenAI client) per API key for the whole process.
+# An evicted gateway is closed, or its loop thread and sockets would outlive it.
+@st.cache_resource(max_entries=32, show_spinner=False, on_release=lambda gateway: gateway.close())
+def get_openai_client(api_key):
+    # openai is slow to import, so it is only loaded once someone chats
+    from llm_gateway import LLMGateway
     
+    return LLMGateway(
+        api_key=api_key,
+        max_concurrency=int(os.environ.get("CARBON_CALC_LLM_CONCURRENCY", 8)),
+        tokens_per_minute=int(os.environ.get("CARBON_CALC_LLM_TOKENS_PER_MINUTE", 90000))
+    )
+
+# Get API key from secrets or environment variables
+def find_api_key():
     try:
-        client = OpenAI(api_key=api_key)
-        return client
-    except Exception as e:
-        st.sidebar.error(f"Error initializing OpenAI client: {e}")
+        api_key = st.secrets.get("OPENAI_API_KEY")
+    except FileNotFoundError:
+        # No secrets.toml at all
+        api_key = None
+    return api_key or os.environ.get("OPENAI_API_KEY")
+
+# OpenAI client for this session, built on first use
+def init_openai_client():
+    if st.session_state.openai_client is None and st.session_state.openai_api_key:
+        try:
+            st.session_state.openai_client = get_openai_client(st.session_state.openai_api_key)
+        except Exception as e:
+            st.error(f"Error initializing OpenAI client: {e}")
+            st.session_state.openai_api_key = None
+    return st.session_state.openai_client
+
+# Process-wide cache of assistant answers, persisted so it survives restarts
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    path = os.environ.get("CARBON_CALC_RESPONSE_CACHE", os.path.join(".cache", "chat_responses.sqlite3"))
+    ttl = float(os.environ.get("CARBON_CALC_RESPONSE_CACHE_TTL", 24 * 3600))
+    return ResponseCache(path, ttl=ttl)
+
+# Export metrics once per process, as configured by CARBON_CALC_METRICS_PORT / _FILE
+@st.cache_resource(show_spinner=False)
+def start_metrics_exporters():
+    METRICS.start_exporters()
+    return METRICS
+
+# Clear out chat spill files left by sessions that ended without cleaning up, once per process
+@st.cache_resource(show_spinner=False)
+def sweep_stale_sessions():
+    return sweep_spill_files()
+
+# Watch the factor file once per process; new versions are swapped in without a restart
+@st.cache_resource(show_spinner=False)
+def watch_factors():
+    FACTORS.watch(FACTORS_POLL_SECONDS)
+    return FACTORS
+
+# Sketches are loaded once and reloaded only when a nightly run replaces the file
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_cohort_sketches(path, mtime):
+    return CohortSketches.load(path)
+
+def get_cohort_sketches():
+    if not os.path.exists(COHORTS_PATH):
         return None
+    return load_cohort_sketches(COHORTS_PATH, os.path.getmtime(COHORTS_PATH))
+
+# One shared history store; writes are queued to a background thread
+@st.cache_resource(show_spinner=False)
+def get_history_store():
+    return HistoryStore(os.environ.get("CARBON_CALC_HISTORY_DB", os.path.join(".cache", "history.sqlite3")))
+
+# Anonymous id kept in the URL so a user's history survives new sessions
+def get_user_id():
+    if "uid" not in st.query_params:
+        st.query_params["uid"] = uuid.uuid4().hex
+    return st.query_params["uid"]
+
+# Combine the system content (prompt, footprint and knowledge snippets) with token-budgeted history for the API
+def build_chat_messages(messages, system_content, window=None):
+    if window is None:
+        window = ConversationWindow(CHAT_TOKEN_BUDGET)
+    return window.build(system_content, messages)
 
 # Function to get AI response
-def get_ai_response(client, messages, user_data=None):
+def get_ai_response(client, messages, user_data=None, window=None):
     try:
         if not client:
-            return "I'm having trouble connecting to my knowledge base right now. Let me share some general tips about carbon footprints instead. To reduce your carbon footprint, consider using public transportation, reducing meat consumption, and minimizing energy usage at home."
-        
-        # Create system message with context about carbon footprint
-        system_message = {
-            "role": "system",
-            "content": "You are a knowledgeable assistant specializing in carbon footprints and sustainability. "
-                      "Keep answers concise, helpful, and focused on helping the user understand and reduce their carbon footprint."
-        }
-        
-        # Add user data context if available
-        if user_data and user_data["calculated"]:
-            context = f"""
-            User's carbon footprint data:
-            - Total emissions: {user_data['total_emissions']} tonnes CO2/year
-            - Transportation: {user_data['transportation_emissions']} tonnes CO2/year
-            - Electricity: {user_data['electricity_emissions']} tonnes CO2/year
-            - Diet: {user_data['diet_emissions']} tonnes CO2/year
-            - Waste: {user_data['waste_emissions']} tonnes CO2/year
-            - Country: {user_data['country']}
-            - Country average: {GLOBAL_AVERAGE_EMISSIONS[user_data['country']]} tonnes CO2/year
-            - Highest emission category: {user_data['highest_category']}
-            """
-            system_message["content"] += context
-        
-        # Prepare messages for API
-        formatted_messages = [system_message]
-        
-        # Add the conversation history (limited to last 10 messages to save tokens)
-        for msg in messages[-10:]:
-            formatted_messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
-        
-        # Call OpenAI API with new client format
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=formatted_messages,
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
+            return FALLBACK_RESPONSE
+        return ai_response(client, messages, user_data, window or ConversationWindow(CHAT_TOKEN_BUDGET), get_response_cache())
+    
+    except Exception as e:
+        logger.exception("AI response failed; using the fallback reply")
+        CHAT_FALLBACKS.labels("error").inc()
+        st.error(f"Error getting AI response: {str(e)}")
+        return FALLBACK_RESPONSE
+
+# Stream an AI response into the chat as it is generated
+def stream_ai_response(client, messages, user_data=None, window=None):
+    # The reply goes into the transcript before the first token so partial
+    # text survives a rerun or a cancel
+    history = list(messages)
+    reply = new_message("assistant", "")
+    messages.append(reply)
+    try:
+        return stream_into_reply(client, history, reply, user_data, window)
+    finally:
+        # Stopped before the first token: drop the blank bubble so it isn't
+        # shown or sent upstream as an empty assistant turn
+        if not reply["content"] and messages and messages[-1] is reply:
+            messages.pop()
+
+# Fill `reply` from the knowledge base, the response cache or the streamed completion
+def stream_into_reply(client, history, reply, user_data=None, window=None):
+    # Questions the knowledge base answers confidently skip the API entirely
+    answer, system_content = grounded_prompt(history, user_data)
+    if answer is not None:
+        reply["content"] = answer
+        return answer
+    
+    cache = get_response_cache()
+    cache_key = make_key(history, user_data)
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            reply["content"] = cached
+            return cached
     
+    placeholder = st.empty()
+    # Any click reruns the script, which stops this run and closes the stream
+    stop_button = st.empty()
+    stop_button.button("Stop generating", key="stop_generating")
+    
+    usage = {}
+    try:
+        with closing(client.stream(build_chat_messages(history, system_content, window), usage=usage)) as deltas:
+            for delta in deltas:
+                reply["content"] += delta
+                placeholder.markdown(render_message(reply, cursor="▌"), unsafe_allow_html=True)
     except Exception as e:
+        logger.exception("Streamed AI response failed")
         st.error(f"Error getting AI response: {str(e)}")
-        return "I'm having trouble connecting to my knowledge base right now. Let me share some general tips about carbon footprints instead. To reduce your carbon footprint, consider using public transportation, reducing meat consumption, and minimizing energy usage at home."
+        if not reply["content"]:
+            CHAT_FALLBACKS.labels("error").inc()
+            reply["content"] = FALLBACK_RESPONSE
+        return reply["content"]
+    finally:
+        # The finished reply is shown by the transcript instead
+        placeholder.empty()
+        stop_button.empty()
+    
+    if cache_key is not None and reply["content"]:
+        cache.put(cache_key, reply["content"], usage.get("total_tokens", 0))
+    return reply["content"]
+
+start_metrics_exporters()
+sweep_stale_sessions()
+
+# One factor table per run, so a hot swap mid-run can't mix versions
+factors = watch_factors().table
 
 # Initialize session state
-if 'calculated' not in st.session_state:
-    st.session_state.calculated = False
-if 'total_emissions' not in st.session_state:
-    st.session_state.total_emissions = 0
-if 'transportation_emissions' not in st.session_state:
-    st.session_state.transportation_emissions = 0
-if 'electricity_emissions' not in st.session_state:
-    st.session_state.electricity_emissions = 0
-if 'diet_emissions' not in st.session_state:
-    st.session_state.diet_emissions = 0
-if 'waste_emissions' not in st.session_state:
-    st.session_state.waste_emissions = 0
-if 'chart_data' not in st.session_state:
-    st.session_state.chart_data = None
+if 'footprint' not in st.session_state:
+    st.session_state.footprint = None  # FootprintResult once calculated
+    st.session_state.footprint_inputs = None  # Calculator inputs behind it, for the what-if sweep
+    st.session_state.uncertainty = None  # (inputs and factor version, intervals) last shown
 if 'messages' not in st.session_state:
-    st.session_state.messages = [
-        {"role": "assistant", "content": random.choice(AI_GREETINGS), "time": datetime.now().strftime("%H:%M")}
-    ]
-if 'highest_category' not in st.session_state:
-    st.session_state.highest_category = ""
-if 'country' not in st.session_state:
-    st.session_state.country = "India"  # Default country
-if 'openai_client' not in st.session_state:
-    st.session_state.openai_client = init_openai_client()
-if 'user_input' not in st.session_state:
-    st.session_state.user_input = ""
+    st.session_state.messages = MessageLog([new_message("assistant", random.choice(AI_GREETINGS))], cap=MESSAGE_CAP)
+if 'openai_api_key' not in st.session_state:
+    # The client itself waits for the first chat message
+    st.session_state.openai_api_key = find_api_key()
+    st.session_state.openai_client = None
+    if not st.session_state.openai_api_key:
+        st.sidebar.warning("OpenAI API key not found. Please set it in your environment variables or Streamlit secrets.")
+if 'transcript' not in st.session_state:
+    st.session_state.transcript = Transcript(TRANSCRIPT_PAGE_SIZE)
+if 'chat_window' not in st.session_state:
+    st.session_state.chat_window = ConversationWindow(CHAT_TOKEN_BUDGET)
+if 'pending_input' not in st.session_state:
+    st.session_state.pending_input = ""
 if 'should_rerun' not in st.session_state:
     st.session_state.should_rerun = False
 
@@ -265,11 +254,10 @@ with tab1:
     
     with col1:
         st.markdown("<p class='category-title'>🌎 Your Location</p>", unsafe_allow_html=True)
-        country = st.selectbox("Select your country", ["India", "United States", "European Union"])
-        st.session_state.country = country
+        country = st.selectbox("Select your country", factors.countries.labels)
         
         st.markdown("<p class='category-title'>🚗 Daily Transportation</p>", unsafe_allow_html=True)
-        transportation_mode = st.selectbox("Primary mode of transportation", ["Car", "Public Transit", "Walking/Cycling", "Mixed"])
+        transportation_mode = st.selectbox("Primary mode of transportation", factors.modes.labels)
         distance = st.slider("Daily commute distance (in km)", 0.0, 100.0, 10.0, key="distance_input")
         
         st.markdown("<p class='category-title'>💡 Electricity Usage</p>", unsafe_allow_html=True)
@@ -277,7 +265,7 @@ with tab1:
         
     with col2:
         st.markdown("<p class='category-title'>🍽️ Dietary Habits</p>", unsafe_allow_html=True)
-        diet_type = st.selectbox("Diet type", ["Vegetarian", "Non-vegetarian", "Vegan"])
+        diet_type = st.selectbox("Diet type", factors.diets.labels)
         meals = st.number_input("Number of meals per day", 0, 6, 3, key="meals_input")
         
         st.markdown("<p class='category-title'>🗑️ Waste Generation</p>", unsafe_allow_html=True)
@@ -286,98 +274,46 @@ with tab1:
         st.markdown("<p class='category-title'>🏠 Housing</p>", unsafe_allow_html=True)
         household_size = st.number_input("Number of people in household", 1, 10, 3)
     
-    # Transportation adjustment based on mode
-    transport_multiplier = 1.0
-    if transportation_mode == "Public Transit":
-        transport_multiplier = 0.6
-    elif transportation_mode == "Walking/Cycling":
-        transport_multiplier = 0.1
-    elif transportation_mode == "Mixed":
-        transport_multiplier = 0.8
-    
     # Calculate button
+    recorded = None
+    sweep = None
     if st.button("Calculate My Carbon Footprint"):
-        with st.spinner("Calculating your carbon footprint..."):
-            time.sleep(1)  # Adding a slight delay for better UX
-            
-            # Normalize inputs to yearly values
-            yearly_distance = distance * 365 * transport_multiplier  # Convert daily distance to yearly with transport mode adjustment
-            yearly_electricity = electricity * 12 / household_size  # Convert monthly electricity to yearly per person
-            yearly_meals = meals * 365  # Convert daily meals to yearly
-            yearly_waste = waste * 52 / household_size  # Convert weekly waste to yearly per person
-            
-            # Calculate carbon emissions
-            transportation_emissions = EMISSION_FACTORS[country]["Transportation"] * yearly_distance
-            electricity_emissions = EMISSION_FACTORS[country]["Electricity"] * yearly_electricity
-            diet_emissions = EMISSION_FACTORS[country]["Diet"][diet_type] * yearly_meals
-            waste_emissions = EMISSION_FACTORS[country]["Waste"] * yearly_waste
-            
-            # Convert emissions to tonnes and round off to 2 decimal points
-            transportation_emissions = round(transportation_emissions / 1000, 2)
-            electricity_emissions = round(electricity_emissions / 1000, 2)
-            diet_emissions = round(diet_emissions / 1000, 2)
-            waste_emissions = round(waste_emissions / 1000, 2)
-            
-            # Calculate total emissions
-            total_emissions = round(
-                transportation_emissions + electricity_emissions + diet_emissions + waste_emissions, 2
-            )
-            
-            # Store results in session state
-            st.session_state.calculated = True
-            st.session_state.total_emissions = total_emissions
-            st.session_state.transportation_emissions = transportation_emissions
-            st.session_state.electricity_emissions = electricity_emissions
-            st.session_state.diet_emissions = diet_emissions
-            st.session_state.waste_emissions = waste_emissions
-            st.session_state.country = country
-            
-            # Create chart data
-            chart_data = pd.DataFrame({
-                'Category': ['Transportation', 'Electricity', 'Diet', 'Waste'],
-                'Emissions (tonnes CO2/year)': [transportation_emissions, electricity_emissions, diet_emissions, waste_emissions]
-            })
-            st.session_state.chart_data = chart_data
-            
-            # Determine highest emission category
-            emissions_dict = {
-                'Transportation': transportation_emissions,
-                'Electricity': electricity_emissions,
-                'Diet': diet_emissions,
-                'Waste': waste_emissions
-            }
-            st.session_state.highest_category = max(emissions_dict, key=emissions_dict.get)
-            
-            # Prepare user data for AI context
-            user_data = {
-                "calculated": True,
-                "total_emissions": total_emissions,
-                "transportation_emissions": transportation_emissions,
-                "electricity_emissions": electricity_emissions,
-                "diet_emissions": diet_emissions,
-                "waste_emissions": waste_emissions,
-                "country": country,
-                "highest_category": st.session_state.highest_category
-            }
+        with RECORDER.phase("compute"), CALCULATION_SECONDS.labels("app").time():
+            results = calculate_footprint(country, transportation_mode, distance, electricity,
+                                          diet_type, meals, waste, household_size, table=factors)
+        CALCULATIONS.labels("app").inc()
+        
+        # Store results in session state
+        st.session_state.footprint = FootprintResult.from_results(results, country)
+        
+        # Save to history; only enqueues, so the results aren't held up by disk I/O
+        inputs = {
+            "country": country, "transportation_mode": transportation_mode, "distance": distance,
+            "electricity": electricity, "diet_type": diet_type, "meals": meals, "waste": waste,
+            "household_size": household_size
+        }
+        recorded = (time.time(), results["total_emissions"])
+        get_history_store().record(get_user_id(), inputs, results, results["factors_version"], ts=recorded[0])
+        st.session_state.footprint_inputs = inputs
+        # Built once here for both the chat message and the results below
+        sweep = ScenarioSweep(**inputs, table=factors)
+        
+        # Generate AI message about results
+        if st.session_state.openai_api_key:
+            with RECORDER.phase("chat_message"):
+                top_tips = sweep.tips(top=1)
+                result_message = build_result_message(results, country, top_tips[0] if top_tips else None, factors)
             
-            # Generate AI message about results
-            if st.session_state.openai_client:
-                result_message = f"I've analyzed your carbon footprint data. Your total emissions are {total_emissions} tonnes CO2/year, "
-                if total_emissions > GLOBAL_AVERAGE_EMISSIONS[country]:
-                    result_message += f"which is above the {country} average of {GLOBAL_AVERAGE_EMISSIONS[country]} tonnes CO2/year. "
-                    result_message += f"Your highest emission category is {st.session_state.highest_category}. Would you like specific tips to reduce your impact in this area?"
-                else:
-                    result_message += f"which is below the {country} average of {GLOBAL_AVERAGE_EMISSIONS[country]} tonnes CO2/year. "
-                    result_message += f"Great job! Would you like to know how you can reduce your footprint even further?"
-                
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": result_message,
-                    "time": datetime.now().strftime("%H:%M")
-                })
-    
+            st.session_state.messages.append(new_message("assistant", result_message))
+
     # Display results if calculation has been performed
-    if st.session_state.calculated:
+    footprint = st.session_state.footprint
+    
+    # What-if sweep over the inputs; cheap enough (well under 10 ms) to redo every rerun
+    if sweep is None and footprint is not None:
+        sweep = ScenarioSweep(**st.session_state.footprint_inputs, table=factors)
+    savings = sweep.tips() if sweep is not None else []
+    if footprint is not None:
         st.markdown("<h2 class='sub-header'>Your Carbon Footprint Results</h2>", unsafe_allow_html=True)
         
         col3, col4 = st.columns(2)
@@ -385,34 +321,84 @@ with tab1:
         with col3:
             st.subheader("Carbon Emissions by Category")
             
+            # Chart data is only built when the results are shown
+            with RECORDER.phase("dataframe"):
+                import pandas as pd
+                
+                emissions = footprint.category_emissions()
+                chart_data = pd.DataFrame({
+                    'Category': list(emissions),
+                    'Emissions (tonnes CO2/year)': list(emissions.values())
+                })
+            
             # Bar chart for emissions by category
-            st.bar_chart(st.session_state.chart_data.set_index('Category'))
+            with RECORDER.phase("chart_render"):
+                st.bar_chart(chart_data.set_index('Category'))
             
             # Category breakdown
-            st.info(f"🚗 Transportation: {st.session_state.transportation_emissions} tonnes CO2/year")
-            st.info(f"💡 Electricity: {st.session_state.electricity_emissions} tonnes CO2/year")
-            st.info(f"🍽️ Diet: {st.session_state.diet_emissions} tonnes CO2/year")
-            st.info(f"🗑️ Waste: {st.session_state.waste_emissions} tonnes CO2/year")
+            st.info(f"🚗 Transportation: {footprint.transportation_emissions} tonnes CO2/year")
+            st.info(f"💡 Electricity: {footprint.electricity_emissions} tonnes CO2/year")
+            st.info(f"🍽️ Diet: {footprint.diet_emissions} tonnes CO2/year")
+            st.info(f"🗑️ Waste: {footprint.waste_emissions} tonnes CO2/year")
             
         with col4:
             st.subheader("Total Carbon Footprint")
             
             # Progress gauge for total emissions
-            national_avg = GLOBAL_AVERAGE_EMISSIONS[st.session_state.country]
-            max_gauge = max(st.session_state.total_emissions, national_avg * 1.5)
+            national_avg = national_average(footprint.country, factors)
+            max_gauge = max(footprint.total_emissions, national_avg * 1.5)
             
             # Total emissions display
-            st.success(f"🌍 Your total carbon footprint: {st.session_state.total_emissions} tonnes CO2/year")
+            st.success(f"🌍 Your total carbon footprint: {footprint.total_emissions} tonnes CO2/year")
+            
+            # Percentile within people like the user
+            sketches = get_cohort_sketches()
+            if sketches is not None:
+                inputs = st.session_state.footprint_inputs
+                percentile, scope = sketches.percentile(footprint.country, inputs["household_size"],
+                                                        inputs["diet_type"], footprint.total_emissions)
+                if percentile is not None:
+                    if scope == "cohort":
+                        cohort = f"{inputs['diet_type'].lower()} households of {inputs['household_size']} in {footprint.country}"
+                    else:
+                        cohort = f"households in {footprint.country}"
+                    st.info(f"📊 Your footprint is lower than {round(100 - percentile)}% of {cohort}")
+            
+            # Optional ranges reflecting the uncertainty in factors and estimates
+            if st.toggle("Show uncertainty ranges", key="show_uncertainty"):
+                # The draws are seeded, so the ranges only change with the inputs or factor set
+                uncertainty_key = (tuple(sorted(st.session_state.footprint_inputs.items())), factors.version)
+                if st.session_state.uncertainty is None or st.session_state.uncertainty[0] != uncertainty_key:
+                    with RECORDER.phase("uncertainty"):
+                        intervals = footprint_intervals(**st.session_state.footprint_inputs,
+                                                        draws=UNCERTAINTY_DRAWS, seed=UNCERTAINTY_SEED, table=factors)
+                    st.session_state.uncertainty = (uncertainty_key, intervals)
+                intervals = st.session_state.uncertainty[1]
+                st.caption(f"90% of outcomes fall within these ranges ({UNCERTAINTY_DRAWS:,} simulated draws)")
+                import pandas as pd
+                
+                st.table(pd.DataFrame({
+                    'Low': [interval["low"] for interval in intervals.values()],
+                    'Mean': [interval["mean"] for interval in intervals.values()],
+                    'High': [interval["high"] for interval in intervals.values()]
+                }, index=list(intervals)))
             
             # Comparison with national average
-            if st.session_state.total_emissions > national_avg:
-                st.warning(f"Your emissions are {round((st.session_state.total_emissions/national_avg - 1) * 100, 1)}% higher than the {st.session_state.country} average of {national_avg} tonnes CO2/year")
+            if footprint.total_emissions > national_avg:
+                st.warning(f"Your emissions are {round((footprint.total_emissions/national_avg - 1) * 100, 1)}% higher than the {footprint.country} average of {national_avg} tonnes CO2/year")
             else:
-                st.success(f"Your emissions are {round((1 - st.session_state.total_emissions/national_avg) * 100, 1)}% lower than the {st.session_state.country} average of {national_avg} tonnes CO2/year")
+                st.success(f"Your emissions are {round((1 - footprint.total_emissions/national_avg) * 100, 1)}% lower than the {footprint.country} average of {national_avg} tonnes CO2/year")
+            
+            # Personalized tips ranked by what they would save
+            if savings:
+                st.subheader("Your Biggest Savings")
+                for tip in savings[:3]:
+                    st.markdown(f"✅ {tip['description']}: saves {tip['saved']} tonnes CO2/year")
+                st.caption(f"Combining these (one option per habit) would bring your footprint down by {sweep.combined_saving(savings[:3])} tonnes CO2/year")
             
             # Tips for the highest emission category
-            st.subheader(f"Tips to Reduce Your {st.session_state.highest_category} Emissions")
-            for tip in REDUCTION_TIPS[st.session_state.highest_category][:3]:
+            st.subheader(f"Tips to Reduce Your {footprint.highest_category} Emissions")
+            for tip in REDUCTION_TIPS[footprint.highest_category][:3]:
                 st.markdown(f"✅ {tip}")
             
             # Button to view all tips
@@ -422,25 +408,41 @@ with tab1:
                     with st.expander(f"{category} Tips"):
                         for tip in tips:
                             st.markdown(f"• {tip}")
+        
+        # Trend of this user's past calculations
+        timestamps, totals = get_history_store().trend(get_user_id(), limit=HISTORY_CHART_POINTS)
+        if recorded is not None and (not timestamps or timestamps[-1] < recorded[0]):
+            # The writer thread may not have saved this run's calculation yet
+            timestamps, totals = timestamps[1 - HISTORY_CHART_POINTS:] + [recorded[0]], totals[1 - HISTORY_CHART_POINTS:] + [recorded[1]]
+        if len(totals) > 1:
+            import pandas as pd
+            
+            st.subheader("Your Footprint Over Time")
+            st.line_chart(pd.DataFrame({
+                'Calculated at': pd.to_datetime(timestamps, unit='s'),
+                'Total emissions (tonnes CO2/year)': totals
+            }).set_index('Calculated at'))
 
 with tab2:
     st.markdown("<h2 class='sub-header'>Chat with Carbon Footprint Assistant</h2>", unsafe_allow_html=True)
     
     # Display API status
-    if st.session_state.openai_client is None:
+    if not st.session_state.openai_api_key:
         st.warning("AI API not initialized. The assistant will provide basic responses only. Please set your API key in the environment variables or Streamlit secrets.")
     
-    # Display chat messages
-    st.markdown("<div class='chat-container' id='chat-container'>", unsafe_allow_html=True)
-    for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f"<div class='user-message'>{message['content']}<div class='time-stamp'>{message['time']}</div></div>", unsafe_allow_html=True)
-        else:
-            st.markdown(f"<div class='bot-message'>{message['content']}<div class='time-stamp'>{message['time']}</div></div>", unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
+    # Display chat messages (fragments are cached; only the newest page is rendered)
+    transcript = st.session_state.transcript
+    hidden = transcript.hidden_count(st.session_state.messages.total)
+    if hidden:
+        st.button(f"Show {min(hidden, transcript.page_size)} earlier messages", on_click=transcript.show_more)
+    transcript_placeholder = st.empty()
+    transcript_placeholder.markdown(transcript.html(st.session_state.messages.tail(transcript.visible)), unsafe_allow_html=True)
     
     # Chat input
     def submit():
+        # Take the text out of the widget here; it can't be cleared once the widget has rendered
+        st.session_state.pending_input = st.session_state.chat_input
+        st.session_state.chat_input = ""
         st.session_state.should_rerun = True
     
     user_input = st.text_input("Ask me about your carbon footprint or how to reduce it:", 
@@ -449,99 +451,37 @@ with tab2:
     
     # Process user input
     if st.session_state.should_rerun:
-        user_input = st.session_state.chat_input
+        # Clear the flag first so a cancelled stream isn't replayed on the next rerun
+        st.session_state.should_rerun = False
+        user_input = st.session_state.pending_input
         if user_input:
             # Add user message to chat
-            st.session_state.messages.append({"role": "user", "content": user_input, "time": datetime.now().strftime("%H:%M")})
+            st.session_state.messages.append(new_message("user", user_input))
             
             # Prepare user data for AI context
-            user_data = {
-                "calculated": st.session_state.calculated,
-                "total_emissions": st.session_state.total_emissions,
-                "transportation_emissions": st.session_state.transportation_emissions,
-                "electricity_emissions": st.session_state.electricity_emissions,
-                "diet_emissions": st.session_state.diet_emissions,
-                "waste_emissions": st.session_state.waste_emissions,
-                "country": st.session_state.country,
-                "highest_category": st.session_state.highest_category
-            }
+            footprint = st.session_state.footprint
+            user_data = footprint.to_user_data() if footprint is not None else {"calculated": False}
             
             # Generate AI response
-            if st.session_state.openai_client:
+            response = None
+            client = init_openai_client()
+            if client and STREAM_RESPONSES:
+                # Streamed replies are added to the transcript as they arrive
+                stream_ai_response(client, st.session_state.messages, user_data, st.session_state.chat_window)
+            elif client:
                 with st.spinner("Thinking..."):
-                    response = get_ai_response(st.session_state.openai_client, st.session_state.messages, user_data)
+                    response = get_ai_response(client, st.session_state.messages, user_data, st.session_state.chat_window)
             else:
-                # Fallback to simple keyword-based responses if API is not available
-                user_input_lower = user_input.lower()
-                
-                if "transportation" in user_input_lower or "commute" in user_input_lower or "car" in user_input_lower:
-                    if st.session_state.calculated:
-                        response = f"Your transportation emissions are {st.session_state.transportation_emissions} tonnes CO2/year. "
-                        response += "Here are some tips to reduce them:\n" + "\n".join([f"• {tip}" for tip in REDUCTION_TIPS["Transportation"][:3]])
-                    else:
-                        response = "Transportation typically accounts for a significant portion of personal carbon emissions. " 
-                        response += "To reduce your impact, consider using public transit, carpooling, or cycling when possible."
-                
-                elif "electricity" in user_input_lower or "energy" in user_input_lower or "power" in user_input_lower:
-                    if st.session_state.calculated:
-                        response = f"Your electricity emissions are {st.session_state.electricity_emissions} tonnes CO2/year. "
-                        response += "Here are some tips to reduce them:\n" + "\n".join([f"• {tip}" for tip in REDUCTION_TIPS["Electricity"][:3]])
-                    else:
-                        response = "Electricity usage contributes significantly to your carbon footprint. "
-                        response += "Using energy-efficient appliances and being mindful of your consumption can help reduce emissions."
-                
-                elif "diet" in user_input_lower or "food" in user_input_lower or "eat" in user_input_lower:
-                    if st.session_state.calculated:
-                        response = f"Your diet-related emissions are {st.session_state.diet_emissions} tonnes CO2/year. "
-                        response += "Here are some tips to reduce them:\n" + "\n".join([f"• {tip}" for tip in REDUCTION_TIPS["Diet"][:3]])
-                    else:
-                        response = "Your dietary choices can have a significant impact on your carbon footprint. "
-                        response += "Plant-based diets generally have lower carbon emissions than meat-heavy diets."
-                
-                elif "waste" in user_input_lower or "trash" in user_input_lower or "garbage" in user_input_lower:
-                    if st.session_state.calculated:
-                        response = f"Your waste-related emissions are {st.session_state.waste_emissions} tonnes CO2/year. "
-                        response += "Here are some tips to reduce them:\n" + "\n".join([f"• {tip}" for tip in REDUCTION_TIPS["Waste"][:3]])
-                    else:
-                        response = "Waste management plays an important role in your overall carbon footprint. "
-                        response += "Recycling, composting, and reducing consumption all help minimize waste-related emissions."
-                
-                elif "total" in user_input_lower or "overall" in user_input_lower or "footprint" in user_input_lower:
-                    if st.session_state.calculated:
-                        response = f"Your total carbon footprint is {st.session_state.total_emissions} tonnes CO2/year, "
-                        national_avg = GLOBAL_AVERAGE_EMISSIONS[st.session_state.country]
-                        if st.session_state.total_emissions > national_avg:
-                            response += f"which is {round((st.session_state.total_emissions/national_avg - 1) * 100, 1)}% higher than the {st.session_state.country} average of {national_avg} tonnes CO2/year."
-                        else:
-                            response += f"which is {round((1 - st.session_state.total_emissions/national_avg) * 100, 1)}% lower than the {st.session_state.country} average of {national_avg} tonnes CO2/year."
-                    else:
-                        response = "To see your total carbon footprint, please go to the Calculator tab and enter your information."
-                
-                elif "tip" in user_input_lower or "help" in user_input_lower or "reduce" in user_input_lower:
-                    response = "Here are some general tips to reduce your carbon footprint:\n"
-                    for category, tips in REDUCTION_TIPS.items():
-                        response += f"\n{category}:\n• {tips[0]}\n• {tips[1]}"
-                        
-                elif "hi" in user_input_lower or "hello" in user_input_lower or "hey" in user_input_lower:
-                    response = random.choice(AI_GREETINGS)
-                    
-                elif "thank" in user_input_lower:
-                    response = "You're welcome! I'm happy to help you understand and reduce your carbon footprint."
-                    
-                else:
-                    response = "I'm here to help you understand your carbon footprint and provide tips to reduce it. " 
-                    response += "You can ask me about specific categories like transportation, electricity, diet, or waste, " 
-                    response += "or ask for general reduction tips."
+                # Fallback to keyword-routed responses if API is not available
+                CHAT_FALLBACKS.labels("offline").inc()
+                response = offline_reply(user_input, footprint, savings)
             
             # Add assistant response to chat
-            st.session_state.messages.append({"role": "assistant", "content": response, "time": datetime.now().strftime("%H:%M")})
-            
-            # Reset input and rerun flag
-            st.session_state.chat_input = ""
-            st.session_state.should_rerun = False
+            if response is not None:
+                st.session_state.messages.append(new_message("assistant", response))
             
-            # Use rerun to refresh the page and show the new messages
-            st.rerun()
+            # Redraw the transcript in place rather than rerunning the whole script
+            transcript_placeholder.markdown(transcript.html(st.session_state.messages.tail(transcript.visible)), unsafe_allow_html=True)
 
 # Add API key input in sidebar
 with st.sidebar:
@@ -551,10 +491,15 @@ with st.sidebar:
     if st.button("Save API Key"):
         if new_api_key:
             os.environ["OPENAI_API_KEY"] = new_api_key
-            st.session_state.openai_client = OpenAI(api_key=new_api_key)
+            st.session_state.openai_api_key = new_api_key
+            st.session_state.openai_client = None
             st.success("API key saved!")
         else:
             st.error("Please enter an API key")
+    
+    # Chat response cache metrics
+    cache_stats = get_response_cache().stats()
+    st.caption(f"Response cache: {cache_stats['hit_rate']:.0%} hit rate, {cache_stats['tokens_saved']} tokens saved")
 
 # Footer
 st.markdown("""
@@ -562,6 +507,9 @@ st.markdown("""
         <h3>About This Calculator</h3>
         <p>This carbon footprint calculator provides an estimate of your personal carbon emissions based on your lifestyle choices. 
         The calculations use average emission factors and may not represent your exact emissions.</p>
-        <p>Data sources: National emission factors based on 2021 data.</p>
+        <p>Data sources: National emission factors based on 2021 data (factor set {factors.version}).</p>
     </div>
-""", unsafe_allow_html=True)
+""".format(factors=factors), unsafe_allow_html=True)
+
+# Log per-phase p50/p99 latencies for this rerun (only when CARBON_CALC_TIMING is set)
+RECORDER.log_summary()
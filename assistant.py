@@ -0,0 +1,154 @@
+import random
+
+from carbon_engine import national_average
+from chat_context import ConversationWindow, system_prompt
+from content import AI_GREETINGS, REDUCTION_TIPS
+from intent_router import ROUTER
+from knowledge import KNOWLEDGE, knowledge_prompt
+from metrics import KNOWLEDGE_ANSWERS
+from response_cache import make_key
+
+FALLBACK_RESPONSE = "I'm having trouble connecting to my knowledge base right now. Let me share some general tips about carbon footprints instead. To reduce your carbon footprint, consider using public transportation, reducing meat consumption, and minimizing energy usage at home."
+
+
+def grounded_prompt(messages, user_data=None):
+    """Return (direct_answer, system_content) for a reply to the last message.
+
+    direct_answer is set when the question closely matches one the knowledge
+    base can answer, so no LLM call is needed. Otherwise system_content is
+    the system prompt plus the most relevant knowledge-base snippets.
+    """
+    if not messages or messages[-1]["role"] != "user":
+        return None, system_prompt(user_data)
+    question = messages[-1]["content"]
+    country = user_data["country"] if user_data and user_data.get("calculated") else None
+    answer = KNOWLEDGE.direct_answer(question, country)
+    if answer is not None:
+        KNOWLEDGE_ANSWERS.inc()
+        return answer, None
+    # Snippets go after the footprint context, so that prefix stays cacheable
+    return None, system_prompt(user_data) + knowledge_prompt(KNOWLEDGE.snippets(question, country=country))
+
+
+def ai_response(client, messages, user_data=None, window=None, cache=None):
+    """Reply to the last message through an LLMGateway, serving repeats from `cache` if given.
+
+    Questions the knowledge base answers confidently never reach the API.
+    Errors from the API are raised; callers decide how to surface them.
+    """
+    answer, system_content = grounded_prompt(messages, user_data)
+    if answer is not None:
+        return answer
+
+    # Serve near-identical opening questions from similar footprint profiles from the cache
+    cache_key = make_key(messages, user_data) if cache is not None else None
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    window = window or ConversationWindow()
+    formatted_messages = window.build(system_content, messages)
+
+    # Call the API through the shared gateway (coalescing, rate limits, retries)
+    response = client.complete(formatted_messages, max_tokens=500, temperature=0.7)
+
+    content = response["content"]
+    if cache_key is not None and content:
+        cache.put(cache_key, content, response["usage"].get("total_tokens", 0))
+    return content
+
+
+# Summary message posted to the chat after a calculation
+def build_result_message(results, country, top_tip=None, table=None):
+    total_emissions = results["total_emissions"]
+    national_avg = national_average(country, table)
+    result_message = f"I've analyzed your carbon footprint data. Your total emissions are {total_emissions} tonnes CO2/year, "
+    if total_emissions > national_avg:
+        result_message += f"which is above the {country} average of {national_avg} tonnes CO2/year. "
+        result_message += f"Your highest emission category is {results['highest_category']}. Would you like specific tips to reduce your impact in this area?"
+    else:
+        result_message += f"which is below the {country} average of {national_avg} tonnes CO2/year. "
+        result_message += f"Great job! Would you like to know how you can reduce your footprint even further?"
+    if top_tip is not None:
+        result_message += f" Your single biggest saving: {top_tip['description'].lower()} would save {top_tip['saved']} tonnes CO2/year."
+    return result_message
+
+
+def offline_reply(user_input, footprint=None, savings=()):
+    """Keyword-routed reply used when no LLM is configured.
+
+    footprint is a FootprintResult (or None before a calculation) and
+    savings the ranked what-if tips for it.
+    """
+    answer = KNOWLEDGE.direct_answer(user_input, footprint.country if footprint is not None else None)
+    if answer is not None:
+        KNOWLEDGE_ANSWERS.inc()
+        return answer
+
+    intent, _ = ROUTER.route(user_input)
+
+    if intent == "transportation":
+        if footprint is not None:
+            response = f"Your transportation emissions are {footprint.transportation_emissions} tonnes CO2/year. "
+            response += "Here are some tips to reduce them:\n" + "\n".join([f"• {tip}" for tip in REDUCTION_TIPS["Transportation"][:3]])
+        else:
+            response = "Transportation typically accounts for a significant portion of personal carbon emissions. " 
+            response += "To reduce your impact, consider using public transit, carpooling, or cycling when possible."
+
+    elif intent == "electricity":
+        if footprint is not None:
+            response = f"Your electricity emissions are {footprint.electricity_emissions} tonnes CO2/year. "
+            response += "Here are some tips to reduce them:\n" + "\n".join([f"• {tip}" for tip in REDUCTION_TIPS["Electricity"][:3]])
+        else:
+            response = "Electricity usage contributes significantly to your carbon footprint. "
+            response += "Using energy-efficient appliances and being mindful of your consumption can help reduce emissions."
+
+    elif intent == "diet":
+        if footprint is not None:
+            response = f"Your diet-related emissions are {footprint.diet_emissions} tonnes CO2/year. "
+            response += "Here are some tips to reduce them:\n" + "\n".join([f"• {tip}" for tip in REDUCTION_TIPS["Diet"][:3]])
+        else:
+            response = "Your dietary choices can have a significant impact on your carbon footprint. "
+            response += "Plant-based diets generally have lower carbon emissions than meat-heavy diets."
+
+    elif intent == "waste":
+        if footprint is not None:
+            response = f"Your waste-related emissions are {footprint.waste_emissions} tonnes CO2/year. "
+            response += "Here are some tips to reduce them:\n" + "\n".join([f"• {tip}" for tip in REDUCTION_TIPS["Waste"][:3]])
+        else:
+            response = "Waste management plays an important role in your overall carbon footprint. "
+            response += "Recycling, composting, and reducing consumption all help minimize waste-related emissions."
+
+    elif intent == "total":
+        if footprint is not None:
+            response = f"Your total carbon footprint is {footprint.total_emissions} tonnes CO2/year, "
+            national_avg = national_average(footprint.country)
+            if footprint.total_emissions > national_avg:
+                response += f"which is {round((footprint.total_emissions/national_avg - 1) * 100, 1)}% higher than the {footprint.country} average of {national_avg} tonnes CO2/year."
+            else:
+                response += f"which is {round((1 - footprint.total_emissions/national_avg) * 100, 1)}% lower than the {footprint.country} average of {national_avg} tonnes CO2/year."
+        else:
+            response = "To see your total carbon footprint, please go to the Calculator tab and enter your information."
+
+    elif intent == "tips" and savings:
+        response = "Based on your inputs, these changes would cut your footprint the most:\n"
+        response += "\n".join(f"• {tip['description']}: saves {tip['saved']} tonnes CO2/year" for tip in savings[:5])
+
+    elif intent == "tips":
+        response = "Here are some general tips to reduce your carbon footprint:\n"
+        for category, tips in REDUCTION_TIPS.items():
+            response += f"\n{category}:\n• {tips[0]}\n• {tips[1]}"
+
+    elif intent == "greeting":
+        response = random.choice(AI_GREETINGS)
+
+    elif intent == "thanks":
+        response = "You're welcome! I'm happy to help you understand and reduce your carbon footprint."
+
+    else:
+        response = "I'm here to help you understand your carbon footprint and provide tips to reduce it. " 
+        response += "You can ask me about specific categories like transportation, electricity, diet, or waste, " 
+        response += "or ask for general reduction tips."
+
+    return response
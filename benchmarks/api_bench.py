@@ -0,0 +1,126 @@
+"""Throughput of the headless API's single-calculation endpoint over keep-alive connections.
+
+    python benchmarks/api_bench.py --workers 4 --connections 64 --duration 10
+    python benchmarks/api_bench.py --url http://127.0.0.1:8600 --msgpack
+
+Starts api_server.py on a free port unless --url is given. The client is a
+minimal asyncio HTTP/1.1 loop (one request in flight per connection) so it
+costs far less CPU than the server it is measuring.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from latency import percentile
+
+INPUTS = {"country": "India", "transportation_mode": "Car", "distance": 10.0, "electricity": 200.0,
+          "diet_type": "Vegan", "meals": 3, "waste": 5.0, "household_size": 3}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def build_request(host, body, content_type):
+    return (
+        f"POST /v1/footprint HTTP/1.1\r\nHost: {host}\r\nContent-Type: {content_type}\r\n"
+        f"Accept: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n"
+    ).encode("ascii") + body
+
+
+async def connection(host, port, request, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(request)
+            head = await reader.readuntil(b"\r\n\r\n")
+            status = head[9:12]
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if status != b"200":
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(host, port, request, connections, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(connection(host, port, request, deadline, latencies, errors) for _ in range(connections)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def wait_for_port(host, port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"API server did not start on {host}:{port}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark an already running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="server worker processes")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--msgpack", action="store_true", help="send and accept MessagePack instead of JSON")
+    args = parser.parse_args(argv)
+
+    if args.msgpack:
+        import msgpack
+        body, content_type = msgpack.packb(INPUTS), "application/msgpack"
+    else:
+        body, content_type = json.dumps(INPUTS).encode("utf-8"), "application/json"
+
+    server = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        # No API key, so chat stays offline and nothing leaves the machine
+        env = dict(os.environ, OPENAI_API_KEY="")
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "api_server.py"), "--port", str(port), "--workers", str(args.workers)],
+            cwd=ROOT, env=env
+        )
+    try:
+        wait_for_port(host, port)
+        request = build_request(host, body, content_type)
+        asyncio.run(run(host, port, request, args.connections, 1.0))  # warm up
+        latencies, errors, elapsed = asyncio.run(run(host, port, request, args.connections, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    print(f"{len(latencies) / elapsed:,.0f} requests/sec over {args.connections} keep-alive connections "
+          f"({len(latencies)} requests, {len(errors)} errors)")
+    print(f"latency p50={percentile(latencies, 50) * 1000:.2f}ms p99={percentile(latencies, 99) * 1000:.2f}ms")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
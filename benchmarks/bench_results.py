@@ -0,0 +1,70 @@
+"""Shared helpers for the benchmark suite: latency summaries and JSON result files.
+
+Result files carry enough metadata (commit, Python, platform, factor set)
+to compare runs between releases.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency import percentile
+
+
+def summarize(latencies, elapsed=None):
+    """Count, throughput and p50/p95/p99/max latency (ms) for a list of seconds."""
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"count": 0}
+    summary = {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3)
+    }
+    if elapsed:
+        summary["per_sec"] = round(len(latencies) / elapsed, 1)
+    return summary
+
+
+def format_summary(label, summary):
+    rate = f"{summary['per_sec']:>10,.1f}/s  " if "per_sec" in summary else ""
+    return (f"{label:>32}: {rate}p50={summary['p50_ms']:.2f}ms  p95={summary['p95_ms']:.2f}ms  "
+            f"p99={summary['p99_ms']:.2f}ms  (n={summary['count']})")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadata():
+    from carbon_engine import current_table
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "factors_version": current_table().version
+    }
+
+
+def write_results(path, name, results, config=None):
+    """Write one benchmark's results (plus run metadata) as JSON."""
+    payload = {"benchmark": name, "metadata": metadata(), "config": config or {}, "results": results}
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    return payload
@@ -0,0 +1,102 @@
+"""Micro-benchmarks for the emission calculation: scalar vs batch.
+
+    python benchmarks/calc_bench.py --rows 1000000 --json results/calc.json
+
+Times calculate_footprint per call, calculate_batch on string labels and
+on pre-encoded integer codes at several batch sizes, and checks that the
+batch results match the scalar ones.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_results import format_summary, summarize, write_results
+from carbon_engine import INPUT_COLUMNS, RESULT_COLUMNS, calculate_batch, calculate_footprint, current_table
+
+
+def random_inputs(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    table = current_table()
+    return {
+        "country": rng.choice(table.countries.labels, rows),
+        "transportation_mode": rng.choice(table.modes.labels, rows),
+        "distance": rng.uniform(0, 100, rows).round(1),
+        "electricity": rng.uniform(0, 1000, rows).round(1),
+        "diet_type": rng.choice(table.diets.labels, rows),
+        "meals": rng.integers(0, 7, rows),
+        "waste": rng.uniform(0, 100, rows).round(1),
+        "household_size": rng.integers(1, 11, rows)
+    }
+
+
+def bench_scalar(columns, calls):
+    rows = [{column: columns[column][i].item() for column in INPUT_COLUMNS} for i in range(calls)]
+    latencies = []
+    start = time.perf_counter()
+    for row in rows:
+        t = time.perf_counter()
+        calculate_footprint(**row)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start), rows
+
+
+def bench_batch(columns, repeat):
+    latencies = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        calculate_batch(*(columns[column] for column in INPUT_COLUMNS))
+        latencies.append(time.perf_counter() - t)
+    summary = summarize(latencies)
+    rows = len(columns["country"])
+    summary["rows"] = rows
+    summary["rows_per_sec"] = round(rows / (summary["p50_ms"] / 1000), 1)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="largest batch size")
+    parser.add_argument("--scalar-calls", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per batch size")
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    columns = random_inputs(args.rows)
+    table = current_table()
+    results = {}
+
+    results["scalar"], scalar_rows = bench_scalar(columns, min(args.scalar_calls, args.rows))
+    print(format_summary("calculate_footprint", results["scalar"]))
+
+    # Batch results must match the scalar path exactly
+    batch = calculate_batch(*(columns[column][:len(scalar_rows)] for column in INPUT_COLUMNS))
+    mismatches = sum(
+        any(batch[column][i] != calculate_footprint(**row)[column] for column in RESULT_COLUMNS)
+        for i, row in enumerate(scalar_rows[:2000])
+    )
+    results["scalar_batch_mismatches"] = mismatches
+
+    coded = dict(columns,
+                 country=table.countries.encode(columns["country"]),
+                 transportation_mode=table.modes.encode(columns["transportation_mode"]),
+                 diet_type=table.diets.encode(columns["diet_type"]))
+    for size in sorted({min(size, args.rows) for size in (1_000, 100_000, args.rows)}):
+        for label, source in (("labels", columns), ("codes", coded)):
+            summary = bench_batch({column: values[:size] for column, values in source.items()}, args.repeat)
+            results[f"batch_{label}_{size}"] = summary
+            print(f"{f'calculate_batch {label} x{size}':>32}: {summary['rows_per_sec']:>12,.0f} rows/s  "
+                  f"p50={summary['p50_ms']:.2f}ms")
+
+    print(f"{'scalar/batch mismatches':>32}: {mismatches}")
+    if args.json:
+        write_results(args.json, "calc", results, vars(args))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
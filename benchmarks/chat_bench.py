@@ -0,0 +1,98 @@
+"""Chat benchmark: assistant.ai_response (the core of app.get_ai_response) against the mock OpenAI server.
+
+    python benchmarks/chat_bench.py --requests 200 --distinct 50 --latency 0.3 --threads 16 --json results/chat.json
+
+Runs the same mixed workload of chat turns twice: once with no response
+cache and once with a fresh one, so the cache's effect on latency and
+upstream calls shows up directly.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assistant import ai_response
+from bench_results import format_summary, summarize, write_results
+from carbon_engine import calculate_footprint
+from llm_gateway import LLMGateway
+from mock_openai_server import start_server
+from response_cache import ResponseCache
+from session_model import FootprintResult
+from transcript import new_message
+
+TOPICS = ["commuting by car", "electricity at home", "a vegan diet", "household waste", "flights", "heating"]
+
+
+def workload(requests, distinct, seed=0):
+    rng = random.Random(seed)
+    questions = [f"How can I cut emissions from {TOPICS[i % len(TOPICS)]}? (variant {i})" for i in range(distinct)]
+    return [rng.choice(questions) for _ in range(requests)]
+
+
+def run(gateway, questions, user_data, threads, cache=None):
+    latencies = []
+
+    def turn(question):
+        history = [new_message("assistant", "Hi! Ask me anything about your footprint."), new_message("user", question)]
+        start = time.perf_counter()
+        ai_response(gateway, history, user_data, cache=cache)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(turn, questions))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=50, help="distinct questions in the workload")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock server latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock responses that are HTTP 429")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent chat sessions")
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_server(latency=args.latency, error_rate=args.error_rate)
+    gateway = LLMGateway(api_key="test", base_url=base_url, max_concurrency=args.threads)
+    inputs = {"country": "India", "transportation_mode": "Car", "distance": 10.0, "electricity": 200.0,
+              "diet_type": "Vegetarian", "meals": 3, "waste": 5.0, "household_size": 3}
+    user_data = FootprintResult.from_results(calculate_footprint(**inputs), inputs["country"]).to_user_data()
+    questions = workload(args.requests, args.distinct)
+    directory = tempfile.mkdtemp(prefix="chat-bench-")
+    results = {}
+    try:
+        before = server.request_count
+        results["no_cache"] = run(gateway, questions, user_data, args.threads)
+        results["no_cache"]["upstream_calls"] = server.request_count - before
+        print(format_summary("ai_response (no cache)", results["no_cache"]))
+
+        cache = ResponseCache(os.path.join(directory, "responses.sqlite3"))
+        before = server.request_count
+        results["cached"] = run(gateway, questions, user_data, args.threads, cache)
+        results["cached"]["upstream_calls"] = server.request_count - before
+        results["cached"]["cache"] = cache.stats()
+        cache.close()
+        print(format_summary("ai_response (cache)", results["cached"]))
+        print(f"{'upstream calls':>32}: {results['no_cache']['upstream_calls']} without cache, "
+              f"{results['cached']['upstream_calls']} with cache")
+        results["gateway"] = dict(gateway.stats)
+    finally:
+        gateway.close()
+        server.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        write_results(args.json, "chat", results, vars(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
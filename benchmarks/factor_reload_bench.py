@@ -0,0 +1,108 @@
+"""Load and hot-swap cost of emission-factor datasets with hundreds of countries.
+
+    python benchmarks/factor_reload_bench.py --countries 250
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from carbon_engine import calculate_footprint
+from factor_data import FactorSource, load_factor_table
+
+
+def synthetic_dataset(countries, version):
+    rng = random.Random(version)
+    return {
+        "version": version,
+        "default_mode": "Car",
+        "transport_multipliers": {"Car": 1.0, "Public Transit": 0.6, "Walking/Cycling": 0.1, "Mixed": 0.8},
+        "countries": {
+            f"Country {i:03d}": {
+                "Transportation": round(rng.uniform(0.1, 0.25), 3),
+                "Electricity": round(rng.uniform(0.05, 1.0), 3),
+                "Diet": {
+                    "Vegetarian": round(rng.uniform(0.6, 0.9), 3),
+                    "Non-vegetarian": round(rng.uniform(1.3, 2.0), 3),
+                    "Vegan": round(rng.uniform(0.4, 0.7), 3)
+                },
+                "Waste": round(rng.uniform(0.05, 0.15), 3),
+                "average": round(rng.uniform(0.5, 20.0), 1)
+            }
+            for i in range(countries)
+        }
+    }
+
+
+def publish(path, data):
+    # Write elsewhere, then rename over the live file so readers never see a partial file
+    tmp = path + ".new"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--countries", type=int, default=250)
+    parser.add_argument("--poll", type=float, default=0.05, help="watcher poll interval in seconds")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="factor-bench-")
+    path = os.path.join(directory, "factors.json")
+    cache_dir = os.path.join(directory, "cache")
+    try:
+        publish(path, synthetic_dataset(args.countries, "bench.1"))
+
+        start = time.perf_counter()
+        load_factor_table(path, cache_dir)
+        print(f"cold load (parse + compile, {args.countries} countries): {(time.perf_counter() - start) * 1000:.1f}ms")
+        start = time.perf_counter()
+        load_factor_table(path, cache_dir)
+        print(f"warm load (memory-mapped): {(time.perf_counter() - start) * 1000:.2f}ms")
+
+        source = FactorSource(path, cache_dir)
+        source.watch(args.poll)
+        inputs = {"country": "Country 000", "transportation_mode": "Car", "distance": 10.0, "electricity": 200.0,
+                  "diet_type": "Vegan", "meals": 3, "waste": 5.0, "household_size": 3}
+
+        # Keep calculating while a new version is published; every result must carry a known version
+        versions, errors, stop = {}, [], threading.Event()
+
+        def calculate():
+            while not stop.is_set():
+                try:
+                    version = calculate_footprint(**inputs, table=source.table)["factors_version"]
+                    versions[version] = versions.get(version, 0) + 1
+                except Exception as e:
+                    errors.append(e)
+
+        worker = threading.Thread(target=calculate)
+        worker.start()
+        time.sleep(0.2)
+        published = time.perf_counter()
+        publish(path, synthetic_dataset(args.countries, "bench.2"))
+        while source.table.version != "bench.2":
+            time.sleep(0.001)
+        swapped = time.perf_counter()
+        time.sleep(0.2)
+        stop.set()
+        worker.join()
+        source.stop()
+
+        print(f"hot swap visible after {(swapped - published) * 1000:.1f}ms (poll interval {args.poll * 1000:.0f}ms)")
+        print(f"calculations during swap: {versions}, errors: {len(errors)}")
+        return 1 if errors else 0
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
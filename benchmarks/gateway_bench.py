@@ -0,0 +1,69 @@
+"""Benchmark the LLM gateway against the local mock OpenAI server.
+
+Fires a burst of concurrent chat requests (many of them identical, like a
+crowd asking the same question) and compares calling the OpenAI client
+directly with going through LLMGateway.
+
+    python benchmarks/gateway_bench.py --requests 200 --distinct 10 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+
+from latency import percentile
+from llm_gateway import LLMGateway
+from mock_openai_server import start_server
+
+
+def run(label, call, prompts, threads):
+    latencies = []
+
+    def timed(prompt):
+        start = time.perf_counter()
+        call([{"role": "user", "content": prompt}])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, prompts))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{label:>8}: {len(prompts) / elapsed:8.1f} req/s  "
+          f"p50={percentile(latencies, 50) * 1000:7.1f}ms  p99={percentile(latencies, 99) * 1000:7.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=10, help="number of distinct prompts in the burst")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock server latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock responses that are HTTP 429")
+    parser.add_argument("--concurrency", type=int, default=16, help="gateway concurrency limit")
+    parser.add_argument("--threads", type=int, default=64, help="concurrent callers")
+    args = parser.parse_args(argv)
+
+    server, base_url = start_server(latency=args.latency, error_rate=args.error_rate)
+    prompts = [f"How do I reduce emissions, variant {i % args.distinct}?" for i in range(args.requests)]
+
+    client = OpenAI(api_key="test", base_url=base_url, max_retries=5)
+    before = server.request_count
+    run("direct", lambda messages: client.chat.completions.create(model="mock", messages=messages), prompts, args.threads)
+    print(f"{'':>8}  upstream calls: {server.request_count - before}")
+
+    gateway = LLMGateway(api_key="test", base_url=base_url, max_concurrency=args.concurrency)
+    before = server.request_count
+    run("gateway", gateway.complete, prompts, args.threads)
+    print(f"{'':>8}  upstream calls: {server.request_count - before}  stats: {gateway.stats}")
+    gateway.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
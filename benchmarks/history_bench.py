@@ -0,0 +1,64 @@
+"""Write throughput and range-query latency of the footprint history store.
+
+    python benchmarks/history_bench.py --rows 1000000 --users 10000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from carbon_engine import calculate_footprint
+from history_store import HistoryStore
+from latency import percentile
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    inputs = {"country": "India", "transportation_mode": "Car", "distance": 10.0, "electricity": 200.0,
+              "diet_type": "Vegetarian", "meals": 3, "waste": 5.0, "household_size": 3}
+    results = calculate_footprint(**inputs)
+    users = [f"user-{i}" for i in range(args.users)]
+
+    directory = tempfile.mkdtemp(prefix="history-bench-")
+    store = HistoryStore(os.path.join(directory, "history.sqlite3"))
+    try:
+        now = time.time()
+        start = time.perf_counter()
+        for i in range(args.rows):
+            store.record(users[i % args.users], inputs, results, results["factors_version"], ts=now - (args.rows - i) * 60)
+            if i % 50_000 == 0:
+                # Keep the bounded queue from overflowing while the writer catches up
+                store.flush()
+        enqueued = time.perf_counter() - start
+        store.flush()
+        written = time.perf_counter() - start
+        print(f"record(): {args.rows / enqueued:,.0f} calls/s ({enqueued / args.rows * 1e6:.1f}us each)")
+        print(f"written : {args.rows / written:,.0f} rows/s, dropped {store.dropped}")
+
+        latencies = []
+        span = args.rows * 60
+        for _ in range(args.queries):
+            user = random.choice(users)
+            begin = now - random.uniform(0, span)
+            t = time.perf_counter()
+            store.trend(user, start=begin, end=begin + span / 4)
+            latencies.append(time.perf_counter() - t)
+        latencies.sort()
+        print(f"trend() range query: p50={percentile(latencies, 50) * 1000:.2f}ms p99={percentile(latencies, 99) * 1000:.2f}ms")
+    finally:
+        store.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
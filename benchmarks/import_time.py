@@ -0,0 +1,80 @@
+"""Import-time report for the app's cold start.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --check --json results/import_time.json
+
+Runs the module-level imports of app.py (exactly what a new pod executes
+before the first render) in a fresh interpreter under `-X importtime`, then
+prints the total and the slowest top-level packages. With --check it exits
+non-zero if a module that should only load on demand (openai on the first
+chat, pandas when a chart is built) is imported up front, so CI can gate
+on it.
+"""
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_results import write_results
+
+# Loaded lazily by the app; importing any of them at startup is a regression
+DEFERRED_MODULES = ("openai", "pandas", "llm_gateway")
+
+
+def startup_imports(path):
+    """Source of the import statements at the top level of a script."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def measure(code):
+    """Run `code` under -X importtime; returns [(module, self_us, cumulative_us, depth)]."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", default=os.path.join(ROOT, "app.py"))
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument("--check", action="store_true", help="fail if a deferred module is imported at startup")
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    rows = measure(startup_imports(args.script))
+    top_level = sorted((row for row in rows if row[3] == 0), key=lambda row: row[2], reverse=True)
+    total_ms = sum(row[2] for row in top_level) / 1000
+    imported = {row[0] for row in rows}
+    eager = [module for module in DEFERRED_MODULES if module in imported]
+
+    print(f"{'startup imports':>32}: {total_ms:.1f}ms over {len(rows)} modules")
+    for name, _, cumulative_us, _ in top_level[:args.top]:
+        print(f"{name:>32}: {cumulative_us / 1000:.1f}ms")
+    print(f"{'deferred but imported':>32}: {', '.join(eager) or 'none'}")
+
+    if args.json:
+        results = {
+            "total_ms": round(total_ms, 1),
+            "modules": len(rows),
+            "top_level_ms": {name: round(cumulative_us / 1000, 1) for name, _, cumulative_us, _ in top_level},
+            "deferred_imported": eager
+        }
+        write_results(args.json, "import_time", results, {"script": os.path.relpath(args.script, ROOT)})
+    return 1 if args.check and eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Accuracy and throughput of the offline intent router.
+
+Scores the router against the labelled corpus in intent_corpus.jsonl
+(intent null means "no match, use the generic reply") and times routing.
+Exits non-zero if accuracy falls below --min-accuracy.
+
+    python benchmarks/intent_bench.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import ROUTER
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_corpus.jsonl")
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--iterations", type=int, default=200, help="passes over the corpus for timing")
+    parser.add_argument("--min-accuracy", type=float, default=0.95)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    misses = []
+    for example in corpus:
+        intent, score = ROUTER.route(example["text"])
+        if intent != example["intent"]:
+            misses.append((example["text"], example["intent"], intent, score))
+
+    accuracy = 1 - len(misses) / len(corpus)
+    for text, expected, got, score in misses:
+        print(f"MISS {text!r}: expected {expected}, got {got} ({score:.2f})")
+
+    texts = [example["text"] for example in corpus]
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for text in texts:
+            ROUTER.route(text)
+    elapsed = time.perf_counter() - start
+    routed = args.iterations * len(texts)
+
+    print(f"accuracy: {accuracy:.1%} ({len(corpus) - len(misses)}/{len(corpus)})")
+    print(f"throughput: {routed / elapsed:,.0f} messages/s ({elapsed / routed * 1e6:.1f}us per message)")
+    return 0 if accuracy >= args.min_accuracy else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
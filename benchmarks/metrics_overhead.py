@@ -0,0 +1,100 @@
+"""Cost of the metrics instrumentation on the Calculate path.
+
+    python benchmarks/metrics_overhead.py --iterations 2000 --json results/metrics_overhead.json
+
+The Calculate path is what app.py does when the button is clicked:
+calculate the footprint, build the FootprintResult, rank the top what-if
+tip and write the chat summary. It is timed with and without the
+instrumentation the app wraps around it (one histogram timer and one
+counter), in interleaved rounds, keeping the fastest round of each. That
+A/B difference is usually smaller than run-to-run noise, so the
+instrumentation is also timed on its own; that share of the path is the
+number checked against --budget (exit status 1 if over).
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_results import write_results
+from assistant import build_result_message
+from carbon_engine import calculate_footprint
+from metrics import CALCULATION_SECONDS, CALCULATIONS
+from scenarios import ScenarioSweep
+from session_model import FootprintResult
+
+INPUTS = {"country": "India", "transportation_mode": "Car", "distance": 10.0, "electricity": 200.0,
+          "diet_type": "Vegan", "meals": 3, "waste": 5.0, "household_size": 3}
+
+# Label used only here, so the benchmark doesn't look like app traffic
+TIMER = CALCULATION_SECONDS.labels("benchmark")
+COUNTER = CALCULATIONS.labels("benchmark")
+
+
+def calculate_path(inputs, instrumented):
+    if instrumented:
+        with TIMER.time():
+            results = calculate_footprint(**inputs)
+        COUNTER.inc()
+    else:
+        results = calculate_footprint(**inputs)
+    FootprintResult.from_results(results, inputs["country"])
+    top_tips = ScenarioSweep(**inputs).tips(top=1)
+    return build_result_message(results, inputs["country"], top_tips[0] if top_tips else None)
+
+
+def instrumentation_only():
+    with TIMER.time():
+        pass
+    COUNTER.inc()
+
+
+def time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per round")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--budget", type=float, default=1.0, help="allowed overhead in percent")
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # Warm up caches (factor table, scenario grid) before timing
+    for instrumented in (False, True):
+        calculate_path(INPUTS, instrumented)
+
+    plain, instrumented, cost = [], [], []
+    for _ in range(args.rounds):
+        plain.append(time_per_call(lambda: calculate_path(INPUTS, False), args.iterations))
+        instrumented.append(time_per_call(lambda: calculate_path(INPUTS, True), args.iterations))
+        cost.append(time_per_call(instrumentation_only, args.iterations * 10))
+
+    plain_us = min(plain) * 1e6
+    instrumented_us = min(instrumented) * 1e6
+    cost_us = min(cost) * 1e6
+    results = {
+        "calculate_path_us": round(plain_us, 2),
+        "instrumented_path_us": round(instrumented_us, 2),
+        "instrumentation_us": round(cost_us, 3),
+        "overhead_pct_ab": round(100 * (instrumented_us - plain_us) / plain_us, 3),
+        "overhead_pct": round(100 * cost_us / plain_us, 3)
+    }
+
+    print(f"{'calculate path':>32}: {plain_us:.1f}us")
+    print(f"{'instrumented path':>32}: {instrumented_us:.1f}us ({results['overhead_pct_ab']:+.2f}%, A/B)")
+    print(f"{'instrumentation alone':>32}: {cost_us:.2f}us ({results['overhead_pct']:.2f}% of the path)")
+    if args.json:
+        write_results(args.json, "metrics_overhead", results, vars(args))
+    return 0 if results["overhead_pct"] < args.budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Knowledge-base retrieval latency at scale.
+
+    python benchmarks/retrieval_bench.py --passages 100000 --queries 2000 --json results/retrieval.json
+
+Builds an index over the real knowledge base plus synthetic passages (tips
+and factor facts recombined with random wording, so term frequencies look
+like real text), then times top-k searches for chat-style questions.
+Exits non-zero if p99 exceeds --budget-ms.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_results import format_summary, summarize, write_results
+from carbon_engine import current_table
+from knowledge import DEFAULT_KNOWLEDGE_PATH, KnowledgeIndex, factor_passages, load_knowledge_file, tip_passages
+
+QUERIES = [
+    "How can I reduce my transportation emissions?",
+    "What is the electricity emission factor in India?",
+    "Should I install solar panels on my roof?",
+    "is a vegan diet really better for the climate",
+    "how much co2 does my car emit per km",
+    "what can I do about food waste and packaging",
+    "why is my footprint higher than the national average",
+    "tips for cutting energy use at home in winter",
+]
+
+
+def synthetic_passages(base, count, rng):
+    words = " ".join(p.get("answer") or p["text"] for p in base).split()
+    passages = []
+    for i in range(count):
+        source = rng.choice(base)
+        filler = " ".join(rng.choice(words) for _ in range(rng.randint(8, 30)))
+        passages.append({"text": f"{source.get('answer') or source['text']} {filler} (note {i})",
+                         "category": source["category"], "source": "synthetic"})
+    return passages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--passages", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=5.0, help="allowed p99 search latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    base = tip_passages() + factor_passages(current_table()) + load_knowledge_file(DEFAULT_KNOWLEDGE_PATH)
+    passages = base + synthetic_passages(base, max(0, args.passages - len(base)), rng)
+
+    with tempfile.TemporaryDirectory(prefix="knowledge-bench-") as cache_dir:
+        start = time.perf_counter()
+        KnowledgeIndex.load(passages, cache_dir)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = KnowledgeIndex.load(passages, cache_dir)
+        load_seconds = time.perf_counter() - start
+
+        for query in QUERIES:
+            index.search(query, args.k)  # warm the page cache
+
+        latencies = []
+        start = time.perf_counter()
+        for i in range(args.queries):
+            query = QUERIES[i % len(QUERIES)]
+            t = time.perf_counter()
+            index.search(query, args.k, country="India" if i % 2 else None)
+            latencies.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+
+    search = summarize(latencies, elapsed)
+    results = {"passages": len(passages), "build_s": round(build_seconds, 2), "load_s": round(load_seconds, 3),
+               "search": search}
+    print(f"{'index build':>32}: {build_seconds:.2f}s for {len(passages):,} passages")
+    print(f"{'index load (memory-mapped)':>32}: {load_seconds * 1000:.1f}ms")
+    print(format_summary(f"top-{args.k} search", search))
+    if args.json:
+        write_results(args.json, "retrieval", results, vars(args))
+    return 0 if search["p99_ms"] <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
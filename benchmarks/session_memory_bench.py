@@ -0,0 +1,96 @@
+"""Memory per session: the old loose session-state layout vs the compact model.
+
+Builds N fake sessions with M chat messages each in both layouts and
+measures the allocated bytes with tracemalloc.
+
+    python benchmarks/session_memory_bench.py --sessions 1000 --messages 500
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from carbon_engine import calculate_footprint
+from session_model import FootprintResult, MessageLog
+from transcript import new_message
+
+MESSAGE_TEXT = "How can I reduce the emissions from my daily commute without buying a new car?"
+
+
+def legacy_session(results, messages):
+    # The original layout: a dozen loose keys, an unbounded list of dicts and a DataFrame
+    state = {
+        "calculated": True,
+        "total_emissions": results["total_emissions"],
+        "transportation_emissions": results["transportation_emissions"],
+        "electricity_emissions": results["electricity_emissions"],
+        "diet_emissions": results["diet_emissions"],
+        "waste_emissions": results["waste_emissions"],
+        "highest_category": results["highest_category"],
+        "country": "India",
+        "user_input": "",
+        "should_rerun": False,
+        "chart_data": pd.DataFrame({
+            "Category": ["Transportation", "Electricity", "Diet", "Waste"],
+            "Emissions (tonnes CO2/year)": [results["transportation_emissions"], results["electricity_emissions"],
+                                            results["diet_emissions"], results["waste_emissions"]]
+        }),
+        "messages": []
+    }
+    for i in range(messages):
+        state["messages"].append({"role": "user" if i % 2 else "assistant", "content": f"{MESSAGE_TEXT} ({i})",
+                                  "time": datetime.now().strftime("%H:%M")})
+    return state
+
+
+def compact_session(results, messages, cap, spill_dir):
+    state = {
+        "footprint": FootprintResult.from_results(results, "India"),
+        "messages": MessageLog(cap=cap, spill_dir=spill_dir),
+        "pending_input": "",
+        "should_rerun": False
+    }
+    for i in range(messages):
+        state["messages"].append(new_message("user" if i % 2 else "assistant", f"{MESSAGE_TEXT} ({i})"))
+    return state
+
+
+def measure(build, sessions):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build() for _ in range(sessions)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / sessions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--cap", type=int, default=200, help="in-memory message cap for the compact model")
+    args = parser.parse_args(argv)
+
+    results = calculate_footprint("India", "Car", 10.0, 200.0, "Vegetarian", 3, 5.0, 3)
+    spill_dir = tempfile.mkdtemp(prefix="session-bench-")
+    try:
+        legacy = measure(lambda: legacy_session(results, args.messages), args.sessions)
+        compact = measure(lambda: compact_session(results, args.messages, args.cap, spill_dir), args.sessions)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    print(f"{args.sessions} sessions x {args.messages} messages")
+    print(f"  legacy : {legacy / 1024:8.1f} KiB/session")
+    print(f"  compact: {compact / 1024:8.1f} KiB/session  ({compact / legacy:.0%} of legacy)")
+
+
+if __name__ == "__main__":
+    main()
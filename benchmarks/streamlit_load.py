@@ -0,0 +1,227 @@
+"""Load driver for the Streamlit app: N concurrent sessions calculating and chatting.
+
+    python benchmarks/streamlit_load.py --sessions 20 --chats 3 --latency 0.3 --json results/load.json
+
+Starts the mock OpenAI server and `streamlit run app.py` pointed at it
+(or drives an existing server with --url), then opens one websocket per
+simulated user. Each session loads the page, clicks "Calculate My Carbon
+Footprint" and sends --chats chat messages, speaking Streamlit's own
+protobuf protocol, so every action is a real script rerun. Reports
+throughput and p50/p95/p99 latency per action (send to script_finished)
+and the server's resident memory per open session. Needs websockets
+(pip install -r requirements-dev.txt).
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_results import format_summary, summarize, write_results
+from mock_openai_server import start_server
+
+CALCULATE_LABEL = "Calculate My Carbon Footprint"
+CHAT_KEY = "chat_input"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_bytes(pid):
+    """Resident set size of a process (Linux /proc), or None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class Session:
+    """One simulated browser tab."""
+
+    def __init__(self, url):
+        self.url = url
+        self.widget_ids = {}
+        self.query_string = ""
+
+    async def __aenter__(self):
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    async def rerun(self, widget_states=()):
+        """Send one rerun and wait for the script to finish; returns seconds taken."""
+        message = BackMsg()
+        message.rerun_script.query_string = self.query_string
+        message.rerun_script.page_script_hash = ""
+        message.rerun_script.widget_states.widgets.extend(widget_states)
+        start = time.perf_counter()
+        await self.ws.send(message.SerializeToString())
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.ws.recv())
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                self._note_widget(forward.delta.new_element)
+            elif kind == "page_info_changed":
+                # The app keeps the anonymous user id in the URL
+                self.query_string = forward.page_info_changed.query_string
+            elif kind == "script_finished":
+                return time.perf_counter() - start
+
+    def _note_widget(self, element):
+        kind = element.WhichOneof("type")
+        if kind == "button" and element.button.label == CALCULATE_LABEL:
+            self.widget_ids[CALCULATE_LABEL] = element.button.id
+        elif kind == "text_input" and element.text_input.id.endswith(f"-{CHAT_KEY}"):
+            self.widget_ids[CHAT_KEY] = element.text_input.id
+
+    def click(self, label):
+        state = BackMsg().rerun_script.widget_states.widgets.add()
+        state.id = self.widget_ids[label]
+        state.trigger_value = True
+        return [state]
+
+    def type_text(self, key, text):
+        state = BackMsg().rerun_script.widget_states.widgets.add()
+        state.id = self.widget_ids[key]
+        state.string_value = text
+        return [state]
+
+
+async def simulate(url, index, chats, timings, errors, started, release):
+    try:
+        async with Session(url) as session:
+            timings["load"].append(await session.rerun())
+            timings["calculate"].append(await session.rerun(session.click(CALCULATE_LABEL)))
+            for turn in range(chats):
+                text = f"How can I reduce my transportation emissions? (session {index}, turn {turn})"
+                timings["chat"].append(await session.rerun(session.type_text(CHAT_KEY, text)))
+            started.append(index)
+            # Stay connected until every session is done so memory is measured with all of them open
+            await release.wait()
+    except Exception as e:
+        errors.append(repr(e))
+        started.append(index)
+
+
+async def drive(url, sessions, chats, ramp, server_pid):
+    timings = {"load": [], "calculate": [], "chat": []}
+    errors, started = [], []
+    release = asyncio.Event()
+    start = time.perf_counter()
+    tasks = []
+    for i in range(sessions):
+        tasks.append(asyncio.ensure_future(simulate(url, i, chats, timings, errors, started, release)))
+        await asyncio.sleep(ramp)
+    while len(started) < sessions:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    rss = rss_bytes(server_pid) if server_pid else None
+    release.set()
+    await asyncio.gather(*tasks)
+    return timings, errors, elapsed, rss
+
+
+def wait_for_port(host, port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Streamlit did not start on {host}:{port}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="drive an already running app (e.g. http://127.0.0.1:8501) instead of starting one")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--chats", type=int, default=3, help="chat messages per session")
+    parser.add_argument("--ramp", type=float, default=0.05, help="seconds between session starts")
+    parser.add_argument("--latency", type=float, default=0.3, help="mock OpenAI latency in seconds")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="mock OpenAI delay per streamed token")
+    parser.add_argument("--json", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    server = mock = None
+    workdir = tempfile.mkdtemp(prefix="streamlit-load-")
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        mock, base_url = start_server(latency=args.latency, token_delay=args.token_delay)
+        host, port = "127.0.0.1", free_port()
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY="test",
+            OPENAI_BASE_URL=base_url,
+            # Keep the run's caches and history out of the working tree
+            CARBON_CALC_RESPONSE_CACHE=os.path.join(workdir, "responses.sqlite3"),
+            CARBON_CALC_HISTORY_DB=os.path.join(workdir, "history.sqlite3"),
+            CARBON_CALC_SPILL_DIR=os.path.join(workdir, "sessions")
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "app.py"),
+             "--server.headless", "true", "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    ws_url = f"ws://{host}:{port}/_stcore/stream"
+    try:
+        wait_for_port(host, port)
+        # One warm-up session so imports and cached resources aren't billed to the first user
+        asyncio.run(drive(ws_url, 1, 1, 0, None))
+        baseline_rss = rss_bytes(server.pid) if server else None
+        timings, errors, elapsed, rss = asyncio.run(
+            drive(ws_url, args.sessions, args.chats, args.ramp, server.pid if server else None)
+        )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if mock is not None:
+            mock.shutdown()
+
+    actions = timings["load"] + timings["calculate"] + timings["chat"]
+    results = {action: summarize(values) for action, values in timings.items()}
+    results["all_actions"] = summarize(actions, elapsed)
+    results["sessions"] = args.sessions
+    results["errors"] = errors
+    if rss is not None and baseline_rss is not None:
+        results["rss_mb"] = round(rss / 2**20, 1)
+        results["rss_per_session_kb"] = round((rss - baseline_rss) / args.sessions / 1024, 1)
+
+    for action in ("load", "calculate", "chat"):
+        print(format_summary(action, results[action]))
+    print(format_summary("all actions", results["all_actions"]))
+    if "rss_per_session_kb" in results:
+        print(f"{'server RSS':>32}: {results['rss_mb']} MB, ~{results['rss_per_session_kb']} KB per session")
+    print(f"{'errors':>32}: {len(errors)}")
+    if args.json:
+        write_results(args.json, "streamlit_load", results, vars(args))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
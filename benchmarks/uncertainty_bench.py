@@ -0,0 +1,45 @@
+"""Latency of Monte Carlo footprint intervals, per request and for batch jobs.
+
+    python benchmarks/uncertainty_bench.py --draws 100000 --rows 64 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency import percentile
+from uncertainty import batch_intervals, footprint_intervals
+
+INPUTS = {"country": "India", "transportation_mode": "Car", "distance": 10.0, "electricity": 200.0,
+          "diet_type": "Non-vegetarian", "meals": 3, "waste": 5.0, "household_size": 3}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--draws", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=64, help="households in the batch run")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    footprint_intervals(**INPUTS, draws=args.draws)
+    latencies = []
+    for seed in range(args.repeat):
+        start = time.perf_counter()
+        footprint_intervals(**INPUTS, draws=args.draws, seed=seed)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f"footprint_intervals({args.draws:,} draws): "
+          f"p50={percentile(latencies, 50) * 1000:.1f}ms p99={percentile(latencies, 99) * 1000:.1f}ms")
+
+    for workers in (1, args.workers or os.cpu_count() or 1):
+        start = time.perf_counter()
+        batch_intervals([INPUTS] * args.rows, draws=args.draws, seed=0, workers=workers)
+        elapsed = time.perf_counter() - start
+        print(f"batch_intervals({args.rows} rows, workers={workers}): {elapsed:.2f}s ({args.rows / elapsed:,.1f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Score household survey files offline with the Calculator tab's formulas.
+
+Usage:
+    python bulk_score.py households.csv scored.parquet --workers 8
+
+Input and output may be CSV or Parquet (picked from the file extension).
+The input needs the columns in carbon_engine.INPUT_COLUMNS; every input
+column is written back out alongside the per-category emissions, the total,
+highest_category and the factors_version used. Files are streamed in chunks,
+so memory stays bounded by roughly chunk_size * (workers * 2) rows no matter
+how large the file is.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from carbon_engine import INPUT_COLUMNS, RESULT_COLUMNS, calculate_dataframe
+
+# Read as float64 in every chunk so a column that happens to hold only whole
+# numbers in one chunk doesn't come back as int64 and change the output schema
+NUMERIC_INPUT_COLUMNS = ["distance", "electricity", "meals", "waste", "household_size"]
+
+
+def _file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    if extension in (".csv", ".txt") or path.endswith(".csv.gz"):
+        return "csv"
+    raise ValueError(f"Unsupported file type for {path}; use .csv or .parquet")
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrames of at most chunk_size rows from a CSV or Parquet file."""
+    if _file_format(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size,
+                               dtype={column: "float64" for column in NUMERIC_INPUT_COLUMNS})
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file.
+
+    Chunks go to a temporary file next to `path`, which replaces `path` only
+    when close() is called after a successful run; abort() removes it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.format = _file_format(path)
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._parquet_writer = None
+        self._wrote_header = False
+
+    def write(self, df):
+        if self.format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self._tmp_path, table.schema)
+            else:
+                # Later chunks must match the schema the file was opened with
+                table = table.cast(self._parquet_writer.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            df.to_csv(self._tmp_path, mode="a" if self._wrote_header else "w",
+                      header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        """Finish the file and move it into place."""
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if os.path.exists(self._tmp_path):
+            os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Drop everything written so far, leaving any existing output untouched."""
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+def score_chunk(df):
+    missing = [column for column in INPUT_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Input is missing columns: {', '.join(missing)}")
+    # Re-scoring an already scored file replaces the old results
+    stale = [column for column in RESULT_COLUMNS + ["highest_category", "factors_version"] if column in df.columns]
+    df = df.drop(columns=stale).reset_index(drop=True)
+    return pd.concat([df, calculate_dataframe(df)], axis=1)
+
+
+def score_file(input_path, output_path, chunk_size=100_000, workers=None):
+    """Score input_path into output_path and return the number of rows written."""
+    workers = workers or os.cpu_count() or 1
+    writer = ChunkWriter(output_path)
+    rows = 0
+
+    try:
+        if workers == 1:
+            for chunk in read_chunks(input_path, chunk_size):
+                scored = score_chunk(chunk)
+                writer.write(scored)
+                rows += len(scored)
+            return rows
+
+        # Keep a bounded number of chunks in flight and write them back in order
+        max_in_flight = workers * 2
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for chunk in read_chunks(input_path, chunk_size):
+                pending.append(executor.submit(score_chunk, chunk))
+                if len(pending) >= max_in_flight:
+                    scored = pending.popleft().result()
+                    writer.write(scored)
+                    rows += len(scored)
+            while pending:
+                scored = pending.popleft().result()
+                writer.write(scored)
+                rows += len(scored)
+        return rows
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-score household carbon footprints.")
+    parser.add_argument("input", help="CSV or Parquet file with household survey rows")
+    parser.add_argument("output", help="CSV or Parquet file to write scored rows to")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows per chunk (default: 100000)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = score_file(args.input, args.output, chunk_size=args.chunk_size, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"Scored {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
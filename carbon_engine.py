@@ -0,0 +1,170 @@
+import os
+
+import numpy as np
+
+from factor_data import DEFAULT_FACTORS_PATH, FactorSource
+from factor_table import CATEGORIES, DIET, ELECTRICITY, TRANSPORTATION, WASTE
+
+# Emission factors, national averages and transport multipliers live in a
+# versioned data file; a new file is picked up without a restart once the
+# app starts FACTORS.watch()
+FACTORS_PATH = os.environ.get("CARBON_CALC_FACTORS", DEFAULT_FACTORS_PATH)
+FACTORS_CACHE_DIR = os.environ.get("CARBON_CALC_FACTORS_CACHE", os.path.join(".cache", "factors"))
+
+# Loaded once at import; raises if any country is missing a category
+FACTORS = FactorSource(FACTORS_PATH, FACTORS_CACHE_DIR)
+
+
+def current_table():
+    return FACTORS.table
+
+
+def national_average(country, table=None):
+    """Average yearly footprint (tonnes CO2 per person) for a country."""
+    table = table or FACTORS.table
+    return table.average(table.countries.encode_one(country))
+
+
+# Columns expected by calculate_batch, in the same order as the Calculator inputs
+INPUT_COLUMNS = [
+    "country", "transportation_mode", "distance", "electricity",
+    "diet_type", "meals", "waste", "household_size"
+]
+
+RESULT_COLUMNS = [
+    "transportation_emissions", "electricity_emissions",
+    "diet_emissions", "waste_emissions", "total_emissions"
+]
+
+
+def calculate_footprint(country, transportation_mode, distance, electricity,
+                        diet_type, meals, waste, household_size, table=None):
+    """Calculate the yearly footprint (tonnes CO2) for a single household.
+
+    Uses the current factor table unless one is given; the result records
+    which version it was computed with.
+    """
+    table = table or FACTORS.table
+    country_id = table.countries.encode_one(country)
+    diet_id = table.diets.encode_one(diet_type)
+    transport_multiplier = table.multiplier(table.modes.encode_one(transportation_mode))
+
+    # Normalize inputs to yearly values
+    yearly_distance = distance * 365 * transport_multiplier  # Convert daily distance to yearly with transport mode adjustment
+    yearly_electricity = electricity * 12 / household_size  # Convert monthly electricity to yearly per person
+    yearly_meals = meals * 365  # Convert daily meals to yearly
+    yearly_waste = waste * 52 / household_size  # Convert weekly waste to yearly per person
+
+    # Calculate carbon emissions
+    transportation_emissions = table.factor(country_id, TRANSPORTATION) * yearly_distance
+    electricity_emissions = table.factor(country_id, ELECTRICITY) * yearly_electricity
+    diet_emissions = table.factor(country_id, DIET, diet_id) * yearly_meals
+    waste_emissions = table.factor(country_id, WASTE) * yearly_waste
+
+    # Convert emissions to tonnes and round off to 2 decimal points
+    transportation_emissions = round(transportation_emissions / 1000, 2)
+    electricity_emissions = round(electricity_emissions / 1000, 2)
+    diet_emissions = round(diet_emissions / 1000, 2)
+    waste_emissions = round(waste_emissions / 1000, 2)
+
+    # Calculate total emissions
+    total_emissions = round(
+        transportation_emissions + electricity_emissions + diet_emissions + waste_emissions, 2
+    )
+
+    # Determine highest emission category
+    emissions_dict = {
+        'Transportation': transportation_emissions,
+        'Electricity': electricity_emissions,
+        'Diet': diet_emissions,
+        'Waste': waste_emissions
+    }
+
+    return {
+        "total_emissions": total_emissions,
+        "transportation_emissions": transportation_emissions,
+        "electricity_emissions": electricity_emissions,
+        "diet_emissions": diet_emissions,
+        "waste_emissions": waste_emissions,
+        "highest_category": max(emissions_dict, key=emissions_dict.get),
+        "factors_version": table.version
+    }
+
+
+def round2(values):
+    """Round an array to 2 decimals exactly like Python's built-in round().
+
+    np.round scales by 100 and rounds half to even, which can disagree with
+    round() when the scaled value lands on (or within float error of) .5.
+    Those few ties are re-rounded with round() so batch and per-user results
+    always match.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        idx = np.flatnonzero(ties)
+        rounded.flat[idx] = [round(float(v), 2) for v in values.flat[idx]]
+    return rounded
+
+
+def calculate_batch(country, transportation_mode, distance, electricity,
+                    diet_type, meals, waste, household_size, table=None):
+    """Vectorized calculate_footprint over equal-length columns.
+
+    country, transportation_mode and diet_type may be string labels or
+    integer ids from the factor table's encoders. Returns a dict of float64
+    arrays keyed by RESULT_COLUMNS plus a ``highest_category`` index array
+    into CATEGORIES and the ``factors_version`` string.
+    """
+    table = table or FACTORS.table
+    country_ids = table.countries.encode(country)
+    diet_ids = table.diets.encode(diet_type)
+    mode_ids = table.modes.encode(transportation_mode)
+
+    # Gather per-row factors from the compiled table
+    transport_factor = table.gather(country_ids, TRANSPORTATION)
+    electricity_factor = table.gather(country_ids, ELECTRICITY)
+    waste_factor = table.gather(country_ids, WASTE)
+    diet_factor = table.gather(country_ids, DIET, diet_ids)
+    transport_multiplier = table.multipliers[mode_ids]
+
+    distance = np.asarray(distance, dtype=np.float64)
+    electricity = np.asarray(electricity, dtype=np.float64)
+    meals = np.asarray(meals, dtype=np.float64)
+    waste = np.asarray(waste, dtype=np.float64)
+    household_size = np.asarray(household_size, dtype=np.float64)
+
+    # Same operation order as calculate_footprint so float results are bit-identical
+    transportation_emissions = round2(transport_factor * (distance * 365 * transport_multiplier) / 1000)
+    electricity_emissions = round2(electricity_factor * (electricity * 12 / household_size) / 1000)
+    diet_emissions = round2(diet_factor * (meals * 365) / 1000)
+    waste_emissions = round2(waste_factor * (waste * 52 / household_size) / 1000)
+
+    total_emissions = round2(
+        transportation_emissions + electricity_emissions + diet_emissions + waste_emissions
+    )
+
+    stacked = np.stack([transportation_emissions, electricity_emissions, diet_emissions, waste_emissions])
+
+    return {
+        "transportation_emissions": transportation_emissions,
+        "electricity_emissions": electricity_emissions,
+        "diet_emissions": diet_emissions,
+        "waste_emissions": waste_emissions,
+        "total_emissions": total_emissions,
+        "highest_category": np.argmax(stacked, axis=0),
+        "factors_version": table.version
+    }
+
+
+def calculate_dataframe(df):
+    """Score a pandas DataFrame with INPUT_COLUMNS and return the result columns."""
+    import pandas as pd
+
+    results = calculate_batch(*(df[column].to_numpy() for column in INPUT_COLUMNS))
+    out = pd.DataFrame({column: results[column] for column in RESULT_COLUMNS}, index=df.index)
+    out["highest_category"] = np.asarray(CATEGORIES, dtype=object)[results["highest_category"]]
+    out["factors_version"] = results["factors_version"]
+    return out
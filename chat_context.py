@@ -0,0 +1,147 @@
+import math
+import re
+from functools import lru_cache
+
+from carbon_engine import national_average
+
+SYSTEM_PROMPT = (
+    "You are a knowledgeable assistant specializing in carbon footprints and sustainability. "
+    "Keep answers concise, helpful, and focused on helping the user understand and reduce their carbon footprint."
+)
+
+# Extra tokens the chat format spends on every message (role, separators)
+MESSAGE_OVERHEAD = 4
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    """Approximate BPE token count without a tokenizer download or network call.
+
+    Words cost roughly one token per four characters and punctuation one
+    token each, which tracks the OpenAI tokenizers closely enough for
+    budgeting.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+@lru_cache(maxsize=4096)
+def _system_prompt(profile):
+    if profile is None:
+        return SYSTEM_PROMPT
+    total, transportation, electricity, diet, waste, country, highest_category, average = profile
+    return SYSTEM_PROMPT + f"""
+            User's carbon footprint data:
+            - Total emissions: {total} tonnes CO2/year
+            - Transportation: {transportation} tonnes CO2/year
+            - Electricity: {electricity} tonnes CO2/year
+            - Diet: {diet} tonnes CO2/year
+            - Waste: {waste} tonnes CO2/year
+            - Country: {country}
+            - Country average: {average} tonnes CO2/year
+            - Highest emission category: {highest_category}
+            """
+
+
+def system_prompt(user_data=None):
+    """System prompt plus footprint context, built once per distinct footprint.
+
+    The text is identical from call to call for the same footprint, so it
+    forms a stable prefix that server-side prompt caching can reuse.
+    """
+    if not user_data or not user_data["calculated"]:
+        return _system_prompt(None)
+    return _system_prompt((
+        user_data["total_emissions"],
+        user_data["transportation_emissions"],
+        user_data["electricity_emissions"],
+        user_data["diet_emissions"],
+        user_data["waste_emissions"],
+        user_data["country"],
+        user_data["highest_category"],
+        # Part of the cache key, so a factor swap that moves the average rebuilds the prompt
+        national_average(user_data["country"])
+    ))
+
+
+def summarize_message(message, max_words=30):
+    # Cheap extractive summary: the first sentence, capped at max_words
+    content = " ".join(message["content"].split())
+    first_sentence = re.split(r"(?<=[.!?])\s", content, maxsplit=1)[0]
+    words = first_sentence.split()
+    if len(words) > max_words:
+        first_sentence = " ".join(words[:max_words]) + "..."
+    speaker = "User" if message["role"] == "user" else "Assistant"
+    return f"{speaker}: {first_sentence}"
+
+
+class ConversationWindow:
+    """Packs chat history into a token budget, folding older turns into a rolling summary.
+
+    Keep one per conversation. Messages carry increasing ids and the
+    transcript is only ever appended to, so turns are summarized once as
+    they fall out of the window and the summary grows incrementally rather
+    than being rebuilt on every call. Tracking ids rather than positions
+    keeps this correct when old messages are spilled out of memory.
+    """
+
+    def __init__(self, token_budget=2000, summary_budget=300):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.summary_lines = []
+        self.summary_tokens = 0
+        self.summarized_id = 0
+
+    def _summary_message(self):
+        return {
+            "role": "system",
+            "content": "Summary of the earlier conversation:\n" + "\n".join(f"- {line}" for line in self.summary_lines)
+        }
+
+    def _fold(self, messages):
+        for message in messages:
+            line = summarize_message(message)
+            self.summary_lines.append(line)
+            self.summary_tokens += count_tokens(line) + 1
+        # Drop the oldest summary lines once the summary outgrows its budget
+        while self.summary_lines and self.summary_tokens > self.summary_budget:
+            self.summary_tokens -= count_tokens(self.summary_lines.pop(0)) + 1
+
+    def build(self, system_content, messages):
+        """Return API messages: system prefix, rolling summary, then as much recent history as fits."""
+        if messages and messages[-1]["id"] < self.summarized_id:
+            # The transcript was replaced (e.g. a new conversation); start over
+            self.summary_lines, self.summary_tokens, self.summarized_id = [], 0, 0
+
+        # Only turns that haven't been folded into the summary yet are candidates
+        first = len(messages)
+        while first > 0 and messages[first - 1]["id"] > self.summarized_id:
+            first -= 1
+
+        system_message = {"role": "system", "content": system_content}
+        available = self.token_budget - count_tokens(system_content) - MESSAGE_OVERHEAD - self.summary_budget
+
+        # Walk back from the newest message; the latest one is always sent
+        start = len(messages)
+        used = 0
+        while start > first:
+            cost = message_tokens(messages[start - 1])
+            if used + cost > available and start < len(messages):
+                break
+            used += cost
+            start -= 1
+
+        if start > first:
+            self._fold(messages[first:start])
+            self.summarized_id = messages[start - 1]["id"]
+
+        formatted_messages = [system_message]
+        if self.summary_lines:
+            formatted_messages.append(self._summary_message())
+        for msg in messages[start:]:
+            formatted_messages.append({"role": msg["role"], "content": msg["content"]})
+        return formatted_messages
@@ -0,0 +1,182 @@
+"""Percentile ranks within country / household size / diet cohorts.
+
+Usage:
+    python cohorts.py scored.parquet cohorts.npz
+    python cohorts.py tonights_rows.csv cohorts.npz --base cohorts.npz
+
+Footprint distributions are kept as fixed-bin histograms, one per cohort,
+built from a bulk-scored file (inputs without total_emissions are scored on
+the way in). Histograms over the same bin edges merge by adding counts, so a
+nightly run only needs to read the new rows and pass the previous file as
+--base. Looking up a percentile is a dict lookup plus a binary search over
+the bin edges; the raw data is never touched at request time.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from file_utils import write_atomic
+
+# Cohorts with fewer people than this fall back to the whole country
+MIN_COHORT_SIZE = 30
+
+COHORT_COLUMNS = ["country", "household_size", "diet_type"]
+
+
+def default_edges(bins=512, low=0.01, high=500.0):
+    """Bin edges in tonnes CO2/year: one bin below `low`, then log-spaced up to `high`.
+
+    Log spacing keeps the relative error of an interpolated percentile about
+    the same for a 1-tonne and a 50-tonne footprint. Values above `high` are
+    counted in the last bin.
+    """
+    return np.concatenate([[0.0], np.geomspace(low, high, bins)])
+
+
+class CohortSketches:
+    """Mergeable per-cohort histograms of total emissions."""
+
+    def __init__(self, edges=None, keys=(), counts=None):
+        self.edges = default_edges() if edges is None else np.asarray(edges, dtype=np.float64)
+        self.bins = len(self.edges) - 1
+        self.keys = [tuple(key) for key in keys]
+        self.index = {key: row for row, key in enumerate(self.keys)}
+        self.counts = np.zeros((0, self.bins), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self._cdf = None
+
+    @staticmethod
+    def cohort(country, household_size, diet_type):
+        return (str(country), int(household_size), str(diet_type))
+
+    def _rows_for(self, keys):
+        new = [key for key in keys if key not in self.index]
+        for key in new:
+            self.index[key] = len(self.keys)
+            self.keys.append(key)
+        if new:
+            self.counts = np.vstack([self.counts, np.zeros((len(new), self.bins), dtype=np.int64)])
+        return np.array([self.index[key] for key in keys], dtype=np.intp)
+
+    def _bin(self, totals):
+        return np.clip(np.searchsorted(self.edges, totals, side="right") - 1, 0, self.bins - 1)
+
+    def add(self, country, household_size, diet_type, totals):
+        """Count equal-length columns of cohort fields and total emissions."""
+        country = np.asarray(country)
+        household_size = np.asarray(household_size, dtype=np.int64)
+        diet_type = np.asarray(diet_type)
+        totals = np.asarray(totals, dtype=np.float64)
+
+        # Factorize each column, then combine the codes into one integer per row
+        countries, country_codes = np.unique(country, return_inverse=True)
+        sizes, size_codes = np.unique(household_size, return_inverse=True)
+        diets, diet_codes = np.unique(diet_type, return_inverse=True)
+        combined = (country_codes * len(sizes) + size_codes) * len(diets) + diet_codes
+        present, cohort_codes = np.unique(combined, return_inverse=True)
+
+        keys = []
+        for code in present:
+            rest, d = divmod(int(code), len(diets))
+            c, s = divmod(rest, len(sizes))
+            keys.append(self.cohort(countries[c], sizes[s], diets[d]))
+        rows = self._rows_for(keys)
+
+        flat = rows[cohort_codes] * self.bins + self._bin(totals)
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+        self._cdf = None
+
+    def merge(self, other):
+        """Add another set of sketches (built over the same bin edges) into this one."""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Cannot merge cohort sketches with different bin edges")
+        rows = self._rows_for(other.keys)
+        np.add.at(self.counts, rows, other.counts)
+        self._cdf = None
+        return self
+
+    def _prepare(self):
+        # Counts strictly below each bin, per cohort and for each country overall
+        cdf = np.zeros((len(self.keys), self.bins + 1), dtype=np.int64)
+        np.cumsum(self.counts, axis=1, out=cdf[:, 1:])
+        countries = {}
+        for key, row in self.index.items():
+            countries.setdefault(key[0], []).append(row)
+        country_cdf = {country: cdf[rows].sum(axis=0) for country, rows in countries.items()}
+        self._cdf = (cdf, country_cdf)
+
+    def size(self, country, household_size, diet_type):
+        row = self.index.get(self.cohort(country, household_size, diet_type))
+        return 0 if row is None else int(self.counts[row].sum())
+
+    def percentile(self, country, household_size, diet_type, total):
+        """Share (0-100) of the cohort with a lower footprint than `total`.
+
+        Returns (percentile, cohort) where cohort is "cohort" or "country"
+        when the cohort is too small and the whole country was used, or
+        (None, None) when there is no data for the country.
+        """
+        if self._cdf is None:
+            self._prepare()
+        cdf, country_cdf = self._cdf
+        row = self.index.get(self.cohort(country, household_size, diet_type))
+        if row is not None and cdf[row, -1] >= MIN_COHORT_SIZE:
+            counts, scope = cdf[row], "cohort"
+        elif country in country_cdf and country_cdf[country][-1] > 0:
+            counts, scope = country_cdf[country], "country"
+        else:
+            return None, None
+
+        b = int(self._bin(total))
+        # Assume people are spread evenly within the bin
+        low, high = self.edges[b], self.edges[b + 1]
+        within = min(max((total - low) / (high - low), 0.0), 1.0)
+        below = counts[b] + within * (counts[b + 1] - counts[b])
+        return round(float(100 * below / counts[-1]), 1), scope
+
+    def save(self, path):
+        write_atomic(path, lambda f: np.savez_compressed(
+            f, edges=self.edges, counts=self.counts, keys=np.array(json.dumps(self.keys))))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["edges"], json.loads(str(data["keys"])), data["counts"])
+
+
+def build_sketches(input_path, base=None, chunk_size=100_000):
+    """Add every row of a (scored or unscored) CSV/Parquet file to `base` or to new sketches."""
+    from bulk_score import read_chunks
+    from carbon_engine import calculate_dataframe
+
+    sketches = base or CohortSketches()
+    rows = 0
+    for chunk in read_chunks(input_path, chunk_size):
+        totals = chunk["total_emissions"] if "total_emissions" in chunk.columns else calculate_dataframe(chunk)["total_emissions"]
+        sketches.add(*(chunk[column].to_numpy() for column in COHORT_COLUMNS), totals.to_numpy())
+        rows += len(chunk)
+    return sketches, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update cohort percentile sketches.")
+    parser.add_argument("input", help="CSV or Parquet file of households (scored or not)")
+    parser.add_argument("output", help=".npz file to write the sketches to")
+    parser.add_argument("--base", help="existing sketches to add the new rows to")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows per chunk (default: 100000)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    base = CohortSketches.load(args.base) if args.base else None
+    sketches, rows = build_sketches(args.input, base, args.chunk_size)
+    sketches.save(args.output)
+    elapsed = time.perf_counter() - start
+
+    print(f"Added {rows} rows to {len(sketches.keys)} cohorts in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
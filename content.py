@@ -0,0 +1,101 @@
+# Static content shared by every session. Streamlit reruns app.py on every
+# interaction, but this module is imported (and built) once per process.
+
+# Reduction tips for each category
+REDUCTION_TIPS = {
+    "Transportation": [
+        "Consider carpooling or using public transportation",
+        "Try biking or walking for short distances",
+        "If possible, work from home a few days a week",
+        "Consider an electric or hybrid vehicle for your next purchase",
+        "Combine errands to reduce trips"
+    ],
+    "Electricity": [
+        "Switch to LED bulbs throughout your home",
+        "Unplug electronics when not in use",
+        "Use energy-efficient appliances",
+        "Install solar panels if feasible",
+        "Wash clothes in cold water and air dry when possible"
+    ],
+    "Diet": [
+        "Consider incorporating more plant-based meals",
+        "Reduce food waste by planning meals carefully",
+        "Buy local and seasonal produce when possible",
+        "Limit beef consumption, as it has the highest carbon footprint",
+        "Grow some of your own vegetables if you have space"
+    ],
+    "Waste": [
+        "Compost food scraps when possible",
+        "Recycle diligently according to local guidelines",
+        "Choose products with minimal packaging",
+        "Repair items instead of replacing them",
+        "Use reusable bags, bottles, and containers"
+    ]
+}
+
+# Initial AI greeter messages
+AI_GREETINGS = [
+    "Hello! I'm your carbon footprint assistant. How can I help you today?",
+    "Welcome to the Carbon Calculator! I'm here to help you understand and reduce your carbon footprint.",
+    "Hi there! Ready to calculate your environmental impact? I'm here to assist!"
+]
+
+# CSS for better styling
+APP_CSS = """
+    <style>
+    .main-header {
+        font-size: 2.5rem;
+        color: #2c3e50;
+        text-align: center;
+    }
+    .sub-header {
+        font-size: 1.5rem;
+        color: #34495e;
+    }
+    .category-title {
+        font-weight: bold;
+        font-size: 1.2rem;
+    }
+    .info-box {
+        padding: 10px;
+        border-radius: 5px;
+        margin-bottom: 10px;
+    }
+    .chat-container {
+        border: 1px solid #ddd;
+        border-radius: 10px;
+        padding: 15px;
+        height: 400px;
+        overflow-y: auto;
+        background-color: #f9f9f9;
+    }
+    .user-message {
+        background-color: #dcf8c6;
+        padding: 8px 12px;
+        border-radius: 15px;
+        margin: 5px;
+        margin-left: 20%;
+        margin-right: 5px;
+        display: inline-block;
+        max-width: 80%;
+        float: right;
+        clear: both;
+    }
+    .bot-message {
+        background-color: #ffffff;
+        padding: 8px 12px;
+        border-radius: 15px;
+        margin: 5px;
+        margin-right: 20%;
+        display: inline-block;
+        max-width: 80%;
+        float: left;
+        clear: both;
+    }
+    .time-stamp {
+        font-size: 0.7rem;
+        color: #888;
+        margin-top: 2px;
+    }
+    </style>
+"""
@@ -0,0 +1,186 @@
+"""Versioned emission-factor datasets loaded from disk.
+
+A dataset is a JSON file (see data/emission_factors.json) or a Parquet
+file with one row per country and the columns
+
+    version, country, average, Transportation, Electricity, Waste,
+    Diet/<diet type>..., Mode/<transport mode>...
+
+where the Mode/ columns hold the transport multipliers (the same in every
+row). The first load of a given file compiles it into a .npy factor array
+plus a small JSON sidecar in the cache directory, keyed by the file's
+content hash. Every later load, in any process, memory-maps that array
+instead of reparsing, so server workers share one copy of the pages.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from factor_table import CATEGORIES, CategoricalEncoder, FactorTable, build_factor_table
+from file_utils import write_atomic
+
+logger = logging.getLogger("carbon_calculator.factors")
+
+DEFAULT_FACTORS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "emission_factors.json")
+
+
+def _parse_json(data):
+    countries = data["countries"]
+    emission_factors = {
+        country: {category: values[category] for category in CATEGORIES if category in values}
+        for country, values in countries.items()
+    }
+    averages = {country: values["average"] for country, values in countries.items() if "average" in values}
+    return emission_factors, averages, data["transport_multipliers"], data.get("default_mode", "Car"), data["version"]
+
+
+def _parse_parquet(source):
+    import pandas as pd
+
+    df = pd.read_parquet(source)
+    versions = df["version"].unique()
+    if len(versions) != 1:
+        raise ValueError(f"Invalid emission factors: expected one version, found {list(versions)}")
+    diets = [column.split("/", 1)[1] for column in df.columns if column.startswith("Diet/")]
+    modes = [column.split("/", 1)[1] for column in df.columns if column.startswith("Mode/")]
+    emission_factors, averages = {}, {}
+    for row in df.to_dict("records"):
+        country = row["country"]
+        emission_factors[country] = {
+            "Transportation": row["Transportation"],
+            "Electricity": row["Electricity"],
+            "Diet": {diet: row[f"Diet/{diet}"] for diet in diets},
+            "Waste": row["Waste"]
+        }
+        averages[country] = row["average"]
+    first = df.iloc[0]
+    multipliers = {mode: float(first[f"Mode/{mode}"]) for mode in modes}
+    return emission_factors, averages, multipliers, "Car", str(versions[0])
+
+
+def parse_factor_file(path, data=None):
+    """Parse and validate a dataset into a freshly compiled FactorTable.
+
+    `data` is the file's contents if the caller has already read them;
+    the path's extension still picks the format.
+    """
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    if path.lower().endswith((".parquet", ".pq")):
+        emission_factors, averages, multipliers, default_mode, version = _parse_parquet(io.BytesIO(data))
+    else:
+        emission_factors, averages, multipliers, default_mode, version = _parse_json(json.loads(data))
+    return build_factor_table(emission_factors, averages, multipliers, default_mode, version)
+
+
+def load_factor_table(path, cache_dir):
+    """Load a dataset, compiling it into cache_dir on first use and memory-mapping it after.
+
+    If cache_dir can't be written (a read-only pod), the parsed table is
+    used from memory instead.
+    """
+    # Hash and parse the same bytes, so a file replaced mid-load can't be
+    # cached under the previous contents' digest
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    array_path = os.path.join(cache_dir, f"{digest}.npy")
+    meta_path = os.path.join(cache_dir, f"{digest}.json")
+
+    if not os.path.exists(meta_path):
+        table = parse_factor_file(path, data)
+        meta = {
+            "version": table.version,
+            "countries": table.countries.labels,
+            "diets": table.diets.labels,
+            "modes": table.modes.labels,
+            "default_mode": table.modes.labels[table.modes.default],
+            "multipliers": table.multipliers.tolist(),
+            "averages": table.averages.tolist()
+        }
+        try:
+            # The sidecar is written last, so its presence means the array is complete
+            write_atomic(array_path, lambda f: np.save(f, table.factors))
+            write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode("utf-8")))
+        except OSError as e:
+            logger.warning("Could not cache compiled factors in %s (%s); using them from memory", cache_dir, e)
+            return table
+
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    return FactorTable(
+        CategoricalEncoder("country", meta["countries"]),
+        CategoricalEncoder("diet_type", meta["diets"]),
+        CategoricalEncoder("transportation_mode", meta["modes"], default=meta["default_mode"]),
+        np.load(array_path, mmap_mode="r"),
+        np.array(meta["multipliers"], dtype=np.float64),
+        np.array(meta["averages"], dtype=np.float64),
+        meta["version"]
+    )
+
+
+class FactorSource:
+    """The current FactorTable for a dataset file, hot-swapped when the file changes.
+
+    Readers take `source.table` once per calculation and keep using that
+    object, so a swap never mixes two versions within one result. Swapping
+    is a single reference assignment; a new file that fails to parse or
+    validate is logged and the previous table stays in service. Publish a
+    new version by writing it elsewhere and renaming it over the old path.
+    """
+
+    def __init__(self, path, cache_dir):
+        self.path = path
+        self.cache_dir = cache_dir
+        self._signature = self._stat()
+        self.table = load_factor_table(path, cache_dir)
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stopped = threading.Event()
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def check(self):
+        """Reload if the file changed since the last load. Returns True if the table was swapped."""
+        with self._lock:
+            try:
+                signature = self._stat()
+            except OSError:
+                # Mid-rename or briefly missing; try again on the next poll
+                return False
+            if signature == self._signature:
+                return False
+            try:
+                table = load_factor_table(self.path, self.cache_dir)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # Not retried until the file changes again
+                self._signature = signature
+                logger.error("Keeping factors %s; failed to load %s: %s", self.table.version, self.path, e)
+                return False
+            self._signature = signature
+            previous, self.table = self.table, table
+        logger.info("Swapped emission factors %s -> %s", previous.version, table.version)
+        return True
+
+    def watch(self, interval=2.0):
+        """Poll the file from a daemon thread every `interval` seconds (idempotent)."""
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch_loop, args=(interval,), name="factor-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch_loop(self, interval):
+        while not self._stopped.wait(interval):
+            self.check()
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,136 @@
+import numpy as np
+
+# Category axis of the compiled table
+CATEGORIES = ["Transportation", "Electricity", "Diet", "Waste"]
+TRANSPORTATION, ELECTRICITY, DIET, WASTE = range(len(CATEGORIES))
+
+
+class CategoricalEncoder:
+    """Maps string labels to dense integer ids and back."""
+
+    def __init__(self, name, labels, default=None):
+        self.name = name
+        self.labels = list(labels)
+        self.ids = {label: i for i, label in enumerate(self.labels)}
+        self.default = None if default is None else self.ids[default]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def encode_one(self, label):
+        code = self.ids.get(label, self.default)
+        if code is None:
+            raise KeyError(label)
+        return code
+
+    def encode(self, values):
+        values = np.asarray(values)
+        # Already integer-coded columns pass straight through
+        if values.dtype.kind in "iu":
+            if values.size and (values.min() < 0 or values.max() >= len(self.labels)):
+                raise ValueError(f"{self.name} codes out of range 0..{len(self.labels) - 1}")
+            return values.astype(np.intp, copy=False)
+
+        # The label sets are tiny, so one vectorized comparison per label
+        # beats sorting with np.unique
+        codes = np.full(values.shape, -1, dtype=np.intp)
+        for code, label in enumerate(self.labels):
+            codes[values == label] = code
+        missing = codes < 0
+        if missing.any():
+            if self.default is None:
+                # Unknown labels raise like the dict lookups do
+                raise KeyError(values[missing][0])
+            codes[missing] = self.default
+        return codes
+
+    def decode(self, codes):
+        return np.asarray(self.labels, dtype=object)[codes]
+
+
+class FactorTable:
+    """Emission factors compiled into a dense (country, category, subcategory) array.
+
+    Only Diet has real subcategories (the diet types); the scalar categories
+    are broadcast across the subcategory axis so every gather can use the
+    same (country_id, category, diet_id) index.
+    """
+
+    def __init__(self, countries, diets, modes, factors, multipliers, averages, version=None):
+        self.version = version
+        self.countries = countries
+        self.diets = diets
+        self.modes = modes
+        self.factors = factors
+        self.multipliers = multipliers
+        self.averages = averages
+
+        # Nested Python lists for the per-request path, so a single lookup
+        # returns plain floats without NumPy scalar overhead
+        self._factor_rows = factors.tolist()
+        self._multiplier_list = multipliers.tolist()
+        self._average_list = averages.tolist()
+
+    def factor(self, country_id, category, diet_id=0):
+        return self._factor_rows[country_id][category][diet_id]
+
+    def multiplier(self, mode_id):
+        return self._multiplier_list[mode_id]
+
+    def average(self, country_id):
+        return self._average_list[country_id]
+
+    def gather(self, country_ids, category, diet_ids=0):
+        return self.factors[country_ids, category, diet_ids]
+
+
+def build_factor_table(emission_factors, averages, multipliers, default_mode="Car", version=None):
+    """Compile the nested factor dicts, validating that nothing is missing."""
+    countries = list(emission_factors)
+    if not countries:
+        raise ValueError("Emission factors are empty")
+
+    diets = []
+    for factors in emission_factors.values():
+        for diet in factors.get("Diet", {}):
+            if diet not in diets:
+                diets.append(diet)
+
+    problems = []
+    for country in countries:
+        factors = emission_factors[country]
+        for category in CATEGORIES:
+            if category not in factors:
+                problems.append(f"{country} is missing {category}")
+        for diet in diets:
+            if diet not in factors.get("Diet", {}):
+                problems.append(f"{country} is missing Diet/{diet}")
+        if country not in averages:
+            problems.append(f"{country} has no global average")
+    if default_mode not in multipliers:
+        problems.append(f"Default transportation mode {default_mode} has no multiplier")
+    if problems:
+        raise ValueError("Invalid emission factors: " + "; ".join(problems))
+
+    table = np.empty((len(countries), len(CATEGORIES), len(diets)), dtype=np.float64)
+    for i, country in enumerate(countries):
+        factors = emission_factors[country]
+        table[i, TRANSPORTATION, :] = factors["Transportation"]
+        table[i, ELECTRICITY, :] = factors["Electricity"]
+        table[i, DIET, :] = [factors["Diet"][diet] for diet in diets]
+        table[i, WASTE, :] = factors["Waste"]
+    table.setflags(write=False)
+
+    mode_labels = list(multipliers)
+    multiplier_array = np.array([multipliers[mode] for mode in mode_labels], dtype=np.float64)
+    average_array = np.array([averages[country] for country in countries], dtype=np.float64)
+
+    return FactorTable(
+        CategoricalEncoder("country", countries),
+        CategoricalEncoder("diet_type", diets),
+        CategoricalEncoder("transportation_mode", mode_labels, default=default_mode),
+        table,
+        multiplier_array,
+        average_array,
+        version
+    )
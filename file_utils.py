@@ -0,0 +1,26 @@
+import os
+import threading
+
+
+def write_atomic(path, write):
+    """Write a file so readers only ever see the old contents or the new ones.
+
+    `write` is called with a binary file object open on a temporary file
+    next to `path`, which is then renamed over it. Missing parent
+    directories are created; on failure the temporary file is removed.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Unique per thread, so concurrent writers in one process don't share a temp file
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
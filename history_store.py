@@ -0,0 +1,154 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+logger = logging.getLogger("carbon_calculator.history")
+
+INPUT_FIELDS = [
+    "country", "transportation_mode", "distance", "electricity",
+    "diet_type", "meals", "waste", "household_size"
+]
+RESULT_FIELDS = [
+    "transportation_emissions", "electricity_emissions", "diet_emissions",
+    "waste_emissions", "total_emissions", "highest_category"
+]
+COLUMNS = ["user_id", "ts", "factors_version"] + INPUT_FIELDS + RESULT_FIELDS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calculations (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    factors_version TEXT NOT NULL,
+    country TEXT NOT NULL,
+    transportation_mode TEXT NOT NULL,
+    distance REAL NOT NULL,
+    electricity REAL NOT NULL,
+    diet_type TEXT NOT NULL,
+    meals INTEGER NOT NULL,
+    waste REAL NOT NULL,
+    household_size INTEGER NOT NULL,
+    transportation_emissions REAL NOT NULL,
+    electricity_emissions REAL NOT NULL,
+    diet_emissions REAL NOT NULL,
+    waste_emissions REAL NOT NULL,
+    total_emissions REAL NOT NULL,
+    highest_category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calculations_user_ts ON calculations (user_id, ts);
+CREATE INDEX IF NOT EXISTS calculations_ts ON calculations (ts);
+"""
+
+
+def _connect(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL is durable across application crashes and far faster than FULL
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class HistoryStore:
+    """Append-only log of calculations in SQLite (WAL mode).
+
+    `record` only enqueues the row, so the calculate path never waits on
+    disk; a background writer drains the queue in batched transactions.
+    Reads use their own connection, which WAL lets run alongside writes.
+    """
+
+    def __init__(self, path, batch_size=1000, flush_interval=0.05, max_queue=100000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+
+        # A connection's own `with` only commits; closing() also closes it
+        with closing(_connect(path)) as db:
+            db.executescript(_SCHEMA)
+        self._reader = _connect(path)
+        self._read_lock = threading.Lock()
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopped = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, user_id, inputs, results, factors_version, ts=None):
+        """Queue one calculation for writing. Never blocks; drops the row if the queue is full."""
+        row = (user_id, time.time() if ts is None else ts, factors_version) \
+            + tuple(inputs[field] for field in INPUT_FIELDS) \
+            + tuple(results[field] for field in RESULT_FIELDS)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("History queue full; dropped a calculation (%d dropped so far)", self.dropped)
+
+    def _write_loop(self):
+        with closing(_connect(self.path)) as db:
+            self._drain(db)
+
+    def _drain(self, db):
+        insert = f"INSERT INTO calculations ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        while not (self._stopped.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with db:
+                    db.executemany(insert, batch)
+            except sqlite3.Error:
+                logger.exception("Failed to write %d history rows", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued row has been written."""
+        self._queue.join()
+
+    def _select_range(self, columns, user_id, start, end, limit):
+        sql = f"SELECT {columns} FROM calculations WHERE user_id = ?"
+        params = [user_id]
+        if start is not None:
+            sql += " AND ts >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND ts < ?"
+            params.append(end)
+        sql += " ORDER BY ts"
+        if limit is not None:
+            # Newest `limit` rows, still returned oldest first
+            sql = f"SELECT * FROM ({sql} DESC LIMIT ?) ORDER BY ts"
+            params.append(limit)
+        # Served from the (user_id, ts) index
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def query(self, user_id, start=None, end=None, limit=None):
+        """Return a user's calculations with start <= ts < end, oldest first, as dicts."""
+        rows = self._select_range(", ".join(COLUMNS), user_id, start, end, limit)
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def trend(self, user_id, start=None, end=None, limit=None):
+        """Return (timestamps, totals) for a user's trend chart."""
+        rows = self._select_range("ts, total_emissions", user_id, start, end, limit)
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def close(self):
+        self._stopped.set()
+        self._writer.join()
+        self._reader.close()
@@ -0,0 +1,99 @@
+import re
+
+# Keywords and aliases for each offline chat intent, with their weights.
+# Multi-word entries are matched as whole phrases. Listed in priority order:
+# on equal scores the earlier intent wins.
+INTENT_KEYWORDS = {
+    "transportation": {
+        "transportation": 1.0, "transport": 1.0, "commute": 1.0, "commuting": 1.0, "car": 1.0, "cars": 1.0,
+        "drive": 1.0, "driving": 1.0, "vehicle": 1.0, "vehicles": 1.0, "travel": 0.8, "traveling": 0.8,
+        "flight": 1.0, "flights": 1.0, "fly": 0.8, "flying": 0.8, "bus": 1.0, "train": 1.0, "bike": 1.0,
+        "biking": 1.0, "cycle": 1.0, "cycling": 1.0, "walk": 0.8, "walking": 0.8, "petrol": 1.0, "gasoline": 1.0, "fuel": 0.8,
+        "carpool": 1.0, "carpooling": 1.0, "public transit": 1.2, "electric vehicle": 1.2
+    },
+    "electricity": {
+        "electricity": 1.0, "electric": 0.8, "energy": 1.0, "power": 1.0, "kwh": 1.0, "appliance": 1.0,
+        "appliances": 1.0, "lighting": 1.0, "lights": 0.8, "bulb": 1.0, "bulbs": 1.0, "led": 0.8,
+        "solar": 1.0, "heating": 0.8, "cooling": 0.8, "air conditioning": 1.2, "utility bill": 1.2
+    },
+    "diet": {
+        "diet": 1.0, "food": 1.0, "eat": 1.0, "eating": 1.0, "meal": 1.0, "meals": 1.0, "meat": 1.0,
+        "beef": 1.0, "vegan": 1.0, "vegetarian": 1.0, "plant": 0.6, "dairy": 1.0, "groceries": 0.8,
+        "plant based": 1.2
+    },
+    "waste": {
+        "waste": 1.0, "trash": 1.0, "garbage": 1.0, "rubbish": 1.0, "recycle": 1.0, "recycling": 1.0,
+        "compost": 1.0, "composting": 1.0, "landfill": 1.0, "packaging": 0.8, "plastic": 0.8
+    },
+    "total": {
+        "total": 1.0, "overall": 1.0, "footprint": 0.5, "score": 0.8, "result": 0.8, "results": 0.8,
+        "average": 0.8, "compare": 0.8, "comparison": 0.8, "how am i doing": 1.2
+    },
+    "tips": {
+        "tip": 0.7, "tips": 0.7, "help": 0.5, "reduce": 0.6, "reducing": 0.6, "lower": 0.5, "cut": 0.5,
+        "advice": 0.7, "suggestion": 0.7, "suggestions": 0.7, "improve": 0.5, "greener": 0.6,
+        "sustainable": 0.5, "what can i do": 0.9
+    },
+    "greeting": {
+        "hi": 0.6, "hello": 0.6, "hey": 0.6, "greetings": 0.6, "good morning": 0.7, "good evening": 0.7,
+        "good afternoon": 0.7
+    },
+    "thanks": {
+        "thanks": 0.8, "thank": 0.8, "thx": 0.8, "cheers": 0.6, "appreciate": 0.7
+    }
+}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _WORD_PATTERN.findall(text.lower())
+
+
+class IntentRouter:
+    """Keyword/alias index for routing offline chat messages to an intent.
+
+    The index is built once; routing tokenizes the message, looks up each
+    token (and each adjacent pair/triple for phrases) and sums the
+    weights per intent, so the cost is O(tokens). Whole-token matching
+    means "carbon" no longer matches "car" and "which" no longer matches
+    "hi".
+    """
+
+    def __init__(self, intent_keywords=INTENT_KEYWORDS, min_score=0.5, min_margin=0.0):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.priority = {intent: rank for rank, intent in enumerate(intent_keywords)}
+        self.max_phrase = 1
+        self.index = {}
+        for intent, keywords in intent_keywords.items():
+            for keyword, weight in keywords.items():
+                key = tuple(tokenize(keyword))
+                self.max_phrase = max(self.max_phrase, len(key))
+                self.index.setdefault(key, []).append((intent, weight))
+
+    def scores(self, text):
+        tokens = tokenize(text)
+        scores = {}
+        for i in range(len(tokens)):
+            for n in range(1, self.max_phrase + 1):
+                if i + n > len(tokens):
+                    break
+                for intent, weight in self.index.get(tuple(tokens[i:i + n]), ()):
+                    scores[intent] = scores.get(intent, 0.0) + weight
+        return scores
+
+    def route(self, text):
+        """Return (intent, score), or (None, best_score) when nothing clears the thresholds."""
+        scores = self.scores(text)
+        if not scores:
+            return None, 0.0
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.priority[item[0]]))
+        intent, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if score < self.min_score or score - runner_up < self.min_margin:
+            return None, score
+        return intent, score
+
+
+ROUTER = IntentRouter()
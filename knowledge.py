@@ -0,0 +1,344 @@
+"""Local retrieval over the assistant's knowledge base.
+
+Passages come from three places: the REDUCTION_TIPS content, one fact per
+country and category generated from the current emission factors, and the
+question/answer entries in data/knowledge.json (or CARBON_CALC_KNOWLEDGE),
+which can be extended without code changes.
+
+Passages are embedded as hashed TF-IDF vectors (words and word pairs
+hashed into HASH_DIM buckets, so there is no vocabulary to keep and no
+network call) and stored as an inverted index: for every bucket, the
+passages containing it and their weights. Like the factor table, the
+index is compiled once into the cache directory, keyed by the content
+hash of its passages, and memory-mapped on every later load. A search
+only touches the posting lists of the query's own terms, then picks the
+top k with argpartition.
+
+Every passage is indexed as a whole (for snippets), and each of its
+questions is also indexed on its own. A query that closely matches one of
+those questions is answered with the passage's answer directly.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+
+import numpy as np
+
+from carbon_engine import current_table
+from file_utils import write_atomic
+from content import REDUCTION_TIPS
+from factor_table import DIET, ELECTRICITY, TRANSPORTATION, WASTE
+from intent_router import tokenize
+
+logger = logging.getLogger("carbon_calculator.knowledge")
+
+DEFAULT_KNOWLEDGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "knowledge.json")
+
+# Hash buckets per vector; 2**18 keeps collisions rare for a few million distinct terms
+HASH_DIM = 2 ** 18
+
+# Part of the cache key; bump it when terms() or the weighting changes
+INDEX_FORMAT = 1
+
+# Cosine similarity above which an answerable passage is returned as the reply
+DIRECT_ANSWER_SCORE = float(os.environ.get("CARBON_CALC_DIRECT_ANSWER_SCORE", 0.6))
+
+# Query terms with more postings than this share of the index (and at least
+# STOP_TERM_MIN_POSTINGS) are treated as stop words at search time
+STOP_TERM_SHARE = 0.05
+STOP_TERM_MIN_POSTINGS = 1000
+
+# Passages below this similarity aren't worth spending prompt tokens on
+MIN_SNIPPET_SCORE = 0.1
+
+
+# Function words that would otherwise make every "how do I ..." question look alike
+STOP_WORDS = frozenset("""
+    a about am an and any are as at be can could do does for from get had has have how i if in is it its
+    me my of on or our should so than that the their there these this to was we what when where which
+    who why will with would you your
+""".split())
+
+
+def terms(text):
+    """Hashed ids of the content words and adjacent content-word pairs in `text`."""
+    words = [word for word in tokenize(text) if word not in STOP_WORDS]
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return [zlib.crc32(gram.encode("utf-8")) % HASH_DIM for gram in grams]
+
+
+def _sublinear_tf(term_ids):
+    ids, counts = np.unique(np.asarray(term_ids, dtype=np.int64), return_counts=True)
+    return ids, 1.0 + np.log(counts)
+
+
+def tip_passages():
+    return [
+        {"text": f"{tip}.", "category": category, "source": "tips"}
+        for category, tips in REDUCTION_TIPS.items() for tip in tips
+    ]
+
+
+def factor_passages(table):
+    """One answerable fact per country and category, in the units the calculator uses."""
+    passages = []
+    car = table.modes.encode_one("Car") if "Car" in table.modes.ids else table.modes.default
+    for country in table.countries.labels:
+        c = table.countries.encode_one(country)
+
+        def fact(questions, answer, category):
+            passages.append({"questions": questions, "answer": answer, "category": category,
+                             "country": country, "source": "factors"})
+
+        per_km = table.factor(c, TRANSPORTATION)
+        modes = ", ".join(f"{mode.lower()} {per_km * table.multiplier(m):.3g}"
+                          for m, mode in enumerate(table.modes.labels) if m != car)
+        fact([f"What is the transportation emission factor in {country}?",
+              f"How much CO2 does a car emit per km in {country}?"],
+             f"Transportation in {country}: a car emits about {per_km:.3g} kg CO2 per km; "
+             f"other modes (kg CO2 per km): {modes}.", "Transportation")
+        fact([f"What is the electricity emission factor in {country}?",
+              f"How much CO2 does a kWh of electricity emit in {country}?"],
+             f"Electricity in {country}: about {table.factor(c, ELECTRICITY):.3g} kg CO2 per kWh.",
+             "Electricity")
+        diets = ", ".join(f"{diet.lower()} {table.factor(c, DIET, d):.3g}" for d, diet in enumerate(table.diets.labels))
+        fact([f"What is the diet emission factor in {country}?", f"How much CO2 does a meal emit in {country}?"],
+             f"Diet in {country} (kg CO2 per meal): {diets}.", "Diet")
+        fact([f"What is the waste emission factor in {country}?", f"How much CO2 does a kg of waste emit in {country}?"],
+             f"Waste in {country}: about {table.factor(c, WASTE):.3g} kg CO2 per kg.", "Waste")
+        fact([f"What is the average carbon footprint in {country}?", f"What is the national average footprint in {country}?"],
+             f"Average footprint in {country}: {table.average(c):.3g} tonnes CO2 per person per year.",
+             "General")
+    return passages
+
+
+def load_knowledge_file(path):
+    """Question/answer passages from a knowledge file; a missing file contributes none."""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    passages = []
+    for entry in data["passages"]:
+        if not entry.get("answer"):
+            raise ValueError(f"Invalid knowledge entry (no answer): {entry}")
+        passages.append({**entry, "source": entry.get("source", "knowledge")})
+    return passages
+
+
+def questions(passage):
+    if "questions" in passage:
+        return list(passage["questions"])
+    return [passage["question"]] if passage.get("question") else []
+
+
+def passage_text(passage):
+    # What gets injected into prompts, or returned as a direct answer
+    return passage.get("answer") or passage["text"]
+
+
+def build_index(passages, directory):
+    """Compile passages into posting-list arrays under `directory`.
+
+    Each passage becomes one indexed document for its full text plus one
+    per question; doc_passages maps documents back to passages.
+    """
+    documents = []
+    for i, passage in enumerate(passages):
+        asked = questions(passage)
+        # The category name helps short tips match questions like "how do I use less electricity"
+        documents.append((i, False, " ".join(asked + [passage.get("category", ""), passage_text(passage)])))
+        documents.extend((i, True, question) for question in asked)
+
+    doc_ids, term_ids, tfs = [np.zeros(0, dtype=np.int32)], [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+    for d, (_, _, text) in enumerate(documents):
+        ids, tf = _sublinear_tf(terms(text))
+        doc_ids.append(np.full(len(ids), d, dtype=np.int32))
+        term_ids.append(ids)
+        tfs.append(tf)
+    doc_ids, term_ids, tfs = np.concatenate(doc_ids), np.concatenate(term_ids), np.concatenate(tfs)
+
+    # Smoothed idf, then L2-normalize each document so a dot product is a cosine
+    df = np.bincount(term_ids, minlength=HASH_DIM)
+    idf = (np.log((len(documents) + 1) / (df + 1)) + 1).astype(np.float32)
+    weights = tfs * idf[term_ids]
+    norms = np.sqrt(np.bincount(doc_ids, weights=weights ** 2, minlength=len(documents)))
+    weights /= norms[doc_ids]
+
+    # Group by term: postings for term t are [term_ptr[t], term_ptr[t + 1])
+    order = np.argsort(term_ids, kind="stable")
+    term_ptr = np.zeros(HASH_DIM + 1, dtype=np.int64)
+    np.cumsum(df, out=term_ptr[1:])
+
+    countries = sorted({p["country"] for p in passages if p.get("country")})
+    codes = [countries.index(p["country"]) if p.get("country") else -1 for p in passages]
+
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        "term_ptr": term_ptr,
+        "doc_ids": doc_ids[order],
+        "weights": weights[order].astype(np.float32),
+        "idf": idf,
+        "doc_passages": np.array([i for i, _, _ in documents], dtype=np.int32),
+        "doc_is_question": np.array([asked for _, asked, _ in documents], dtype=bool),
+        "doc_countries": np.array([codes[i] for i, _, _ in documents], dtype=np.int16)
+    }
+    for name, array in arrays.items():
+        write_atomic(os.path.join(directory, f"{name}.npy"), lambda f, array=array: np.save(f, array))
+    # The passage file is written last, so its presence means the arrays are complete
+    meta = {"countries": countries, "passages": passages}
+    write_atomic(os.path.join(directory, "passages.json"), lambda f: f.write(json.dumps(meta).encode("utf-8")))
+
+
+class KnowledgeIndex:
+    """Memory-mapped hashed TF-IDF index with top-k cosine search."""
+
+    ARRAYS = ("term_ptr", "doc_ids", "weights", "idf", "doc_passages", "doc_is_question", "doc_countries")
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, "passages.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.passages = meta["passages"]
+        self.country_ids = {country: i for i, country in enumerate(meta["countries"])}
+        # A query naming a country keeps that country's facts even when the user is elsewhere
+        self._country_terms = {i: set(terms(country)) for country, i in self.country_ids.items()}
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r"))
+
+    @classmethod
+    def load(cls, passages, cache_dir):
+        """Compile `passages` into cache_dir on first use and memory-map the result."""
+        digest = hashlib.sha256(json.dumps([INDEX_FORMAT, HASH_DIM, passages], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        directory = os.path.join(cache_dir, digest)
+        if not os.path.exists(os.path.join(directory, "passages.json")):
+            build_index(passages, directory)
+        return cls(directory)
+
+    def __len__(self):
+        return len(self.passages)
+
+    def _scores(self, query, country):
+        """(candidate document ids, their cosine scores), or None if nothing matches."""
+        query_terms = terms(query)
+        ids, tf = _sublinear_tf(query_terms)
+        if not len(ids):
+            return None
+        starts, ends = self.term_ptr[ids], self.term_ptr[ids + 1]
+        query_weights = tf * self.idf[ids]
+        query_weights /= np.sqrt((query_weights ** 2).sum())
+
+        # Terms in a large share of a big index ("how", "my", "the") barely move the
+        # ranking but dominate the work; their postings are skipped
+        lengths = ends - starts
+        used = (lengths > 0) & (lengths <= max(STOP_TERM_MIN_POSTINGS, STOP_TERM_SHARE * len(self.doc_passages)))
+        if not used.any():
+            return None
+        docs = np.concatenate([self.doc_ids[s:e] for s, e in zip(starts[used], ends[used])])
+        contributions = np.concatenate([self.weights[s:e] * w for s, e, w in
+                                        zip(starts[used], ends[used], query_weights[used])])
+        # Work stays proportional to the postings touched, not to the index size
+        candidates, positions = np.unique(docs, return_inverse=True)
+        scores = np.bincount(positions, weights=contributions)
+
+        if country is not None and not self.named_countries(query_terms):
+            # Leave out facts about other countries than the user's
+            codes = self.doc_countries[candidates]
+            scores[(codes >= 0) & (codes != self.country_ids.get(country, -2))] = 0.0
+        return candidates, scores
+
+    def named_countries(self, query_terms):
+        query_terms = set(query_terms)
+        return {i for i, country_terms in self._country_terms.items() if country_terms <= query_terms}
+
+    def search(self, query, k=3, country=None):
+        """Return up to k (score, passage, matched_question) tuples, best first.
+
+        matched_question is True when the best match for the passage was
+        one of its questions rather than its full text.
+        """
+        matched = self._scores(query, country)
+        if matched is None:
+            return []
+        candidates, scores = matched
+        # A passage can match through several documents; look at enough to fill k distinct passages
+        n = min(len(scores), k * 4)
+        top = np.argpartition(scores, -n)[-n:]
+        top = top[np.argsort(scores[top])[::-1]]
+        results, seen = [], set()
+        for i in top:
+            d = candidates[i]
+            passage = int(self.doc_passages[d])
+            if scores[i] <= 0 or passage in seen:
+                continue
+            seen.add(passage)
+            results.append((float(scores[i]), self.passages[passage], bool(self.doc_is_question[d])))
+            if len(results) == k:
+                break
+        return results
+
+
+class KnowledgeBase:
+    """The index for the current factor version, rebuilt lazily when factors or the knowledge file change."""
+
+    def __init__(self, path, cache_dir):
+        self.path = path
+        self.cache_dir = cache_dir
+        self._key = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+            file_key = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            file_key = None
+        return current_table().version, file_key
+
+    @property
+    def index(self):
+        key = self._signature()
+        if key != self._key:
+            with self._lock:
+                if key != self._key:
+                    passages = tip_passages() + factor_passages(current_table()) + load_knowledge_file(self.path)
+                    self._index = KnowledgeIndex.load(passages, self.cache_dir)
+                    self._key = key
+                    logger.info("Loaded %d knowledge passages (factors %s)", len(self._index), key[0])
+        return self._index
+
+    def search(self, query, k=3, country=None):
+        return self.index.search(query, k, country)
+
+    def direct_answer(self, query, country=None, min_score=DIRECT_ANSWER_SCORE):
+        """An answer passage that matches `query` closely enough to reply with as is, or None."""
+        index = self.index
+        for score, passage, matched_question in index.search(query, k=1, country=country):
+            if not matched_question or score < min_score:
+                break
+            # Only answer with a country's facts when it's the user's or the one asked about
+            fact_country = passage.get("country")
+            if fact_country is None or fact_country == country or \
+                    index.country_ids[fact_country] in index.named_countries(terms(query)):
+                return passage["answer"]
+        return None
+
+    def snippets(self, query, k=3, country=None):
+        """Texts of the passages worth adding to the prompt for `query`."""
+        return [passage_text(passage) for score, passage, _ in self.search(query, k, country) if score >= MIN_SNIPPET_SCORE]
+
+
+def knowledge_prompt(snippets):
+    if not snippets:
+        return ""
+    return "\n\nFacts from the calculator's knowledge base (use them where relevant):\n" + "\n".join(
+        f"- {snippet}" for snippet in snippets)
+
+
+KNOWLEDGE = KnowledgeBase(
+    os.environ.get("CARBON_CALC_KNOWLEDGE", DEFAULT_KNOWLEDGE_PATH),
+    os.environ.get("CARBON_CALC_KNOWLEDGE_CACHE", os.path.join(".cache", "knowledge"))
+)
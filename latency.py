@@ -0,0 +1,80 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger("carbon_calculator.latency")
+
+# Set CARBON_CALC_TIMING=1 to record per-phase timings and log p50/p99 after each rerun
+TIMING_ENABLED = os.environ.get("CARBON_CALC_TIMING", "").lower() in ("1", "true", "yes")
+
+if TIMING_ENABLED and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+
+def percentile(sorted_samples, q):
+    # Nearest-rank percentile over an already sorted list
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[max(0, math.ceil(q / 100 * len(sorted_samples)) - 1)]
+
+
+class LatencyRecorder:
+    """Process-wide per-phase timers with a bounded window of recent samples."""
+
+    def __init__(self, enabled=TIMING_ENABLED, max_samples=1000):
+        self.enabled = enabled
+        self.max_samples = max_samples
+        self._samples = {}
+        # Streamlit runs each session's script on its own thread
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+
+    def summary(self):
+        """Return {phase: {"count", "p50_ms", "p99_ms"}} for every recorded phase."""
+        # Copy under the lock; sorting a deque another thread is appending to can raise
+        with self._lock:
+            snapshot = [(name, list(samples)) for name, samples in self._samples.items()]
+        result = {}
+        for name, samples in snapshot:
+            ordered = sorted(samples)
+            result[name] = {
+                "count": len(ordered),
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p99_ms": percentile(ordered, 99) * 1000
+            }
+        return result
+
+    def log_summary(self):
+        if not self.enabled:
+            return
+        for name, stats in self.summary().items():
+            logger.info("%s: p50=%.3fms p99=%.3fms (n=%d)", name, stats["p50_ms"], stats["p99_ms"], stats["count"])
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+RECORDER = LatencyRecorder()
@@ -0,0 +1,311 @@
+import asyncio
+import hashlib
+import json
+import logging
+import queue
+import random
+import threading
+import time
+
+import openai
+from openai import AsyncOpenAI
+
+from latency import RECORDER
+from metrics import LLM_FIRST_TOKEN_SECONDS, LLM_REQUESTS, LLM_RETRIES, LLM_SECONDS, LLM_TOKENS, TRACER
+
+logger = logging.getLogger("carbon_calculator.llm")
+
+CHAT_MODEL = "gpt-3.5-turbo"
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx responses
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def record_usage(span, usage):
+    # Token counts go on the call's span and into the running totals
+    if not usage:
+        return
+    span["prompt_tokens"] = usage["prompt_tokens"]
+    span["completion_tokens"] = usage["completion_tokens"]
+    LLM_TOKENS.labels("prompt").inc(usage["prompt_tokens"])
+    LLM_TOKENS.labels("completion").inc(usage["completion_tokens"])
+
+
+def estimate_tokens(messages, max_tokens=0):
+    # Rough local estimate (~4 characters per token) used to reserve budget up front
+    prompt = sum(len(str(message.get("content", ""))) // 4 + 4 for message in messages)
+    return prompt + max_tokens
+
+
+class TokenBudget:
+    """Token-per-minute bucket that refills continuously."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+    def refund(self, tokens):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+class LLMGateway:
+    """Shared asyncio front door for chat completions.
+
+    Runs its own event loop on a background thread so Streamlit's
+    synchronous script threads can call `complete` and `stream`. Identical
+    in-flight completions are collapsed into one upstream call, every call
+    waits for a global concurrency slot and token-per-minute budget, and
+    retryable failures are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, api_key=None, base_url=None, client=None, max_concurrency=8,
+                 tokens_per_minute=90000, max_retries=4, backoff_base=0.5, backoff_cap=8.0, timeout=60.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.stats = {"requests": 0, "upstream_calls": 0, "coalesced": 0, "retries": 0}
+
+        # The gateway does its own retries, so the SDK's are turned off
+        self._client = client or AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._budget = TokenBudget(tokens_per_minute) if tokens_per_minute else None
+        self._inflight = {}
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="llm-gateway", daemon=True)
+        self._thread.start()
+
+    def submit(self, messages, model=CHAT_MODEL, max_tokens=500, temperature=0.7):
+        """Start a completion on the gateway's loop and return a concurrent.futures.Future.
+
+        Code running on another event loop can await it with asyncio.wrap_future.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.acomplete(messages, model=model, max_tokens=max_tokens, temperature=temperature), self._loop
+        )
+
+    def complete(self, messages, model=CHAT_MODEL, max_tokens=500, temperature=0.7):
+        """Blocking completion; returns {"content": str, "usage": dict}."""
+        future = self.submit(messages, model=model, max_tokens=max_tokens, temperature=temperature)
+        return future.result(self.timeout * (self.max_retries + 1))
+
+    def stream(self, messages, model=CHAT_MODEL, max_tokens=500, temperature=0.7, usage=None):
+        """Yield text deltas of a streamed completion as they arrive.
+
+        Closing the generator early cancels the upstream request. If `usage`
+        is a dict it is filled with the token counts from the final chunk.
+        """
+        items = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._astream(messages, items, model=model, max_tokens=max_tokens, temperature=temperature), self._loop
+        )
+        try:
+            while True:
+                try:
+                    kind, value = items.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError("Timed out waiting for the next streamed token")
+                if kind == "delta":
+                    yield value
+                elif kind == "usage":
+                    if usage is not None:
+                        usage.update(value)
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            future.cancel()
+
+    async def acomplete(self, messages, model=CHAT_MODEL, max_tokens=500, temperature=0.7):
+        # Single-flight: callers asking the exact same thing share one upstream call
+        key = hashlib.sha256(json.dumps(
+            [model, max_tokens, temperature, messages], sort_keys=True
+        ).encode("utf-8")).hexdigest()
+        self.stats["requests"] += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._traced_complete(messages, model, max_tokens, temperature))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+
+        # Shield so one caller giving up doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _traced_complete(self, messages, model, max_tokens, temperature):
+        # One span per upstream completion, covering its retries
+        with TRACER.span("llm.complete", model=model, max_tokens=max_tokens) as span:
+            outcome = "error"
+            start = time.perf_counter()
+            try:
+                response = await self._with_retries(
+                    lambda: self._complete_once(messages, model, max_tokens, temperature), span
+                )
+                outcome = "ok"
+            finally:
+                LLM_SECONDS.labels("complete").observe(time.perf_counter() - start)
+                LLM_REQUESTS.labels("complete", outcome).inc()
+            record_usage(span, response["usage"])
+            return response
+
+    async def _with_retries(self, call, span=None):
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                # Full jitter keeps a burst of failed callers from retrying in lockstep
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                self.stats["retries"] += 1
+                LLM_RETRIES.inc()
+                if span is not None:
+                    span["retries"] = attempt
+                logger.warning("LLM call failed (%s); retry %d in %.2fs", type(e).__name__, attempt, delay)
+                await asyncio.sleep(delay)
+
+    async def _reserve(self, messages, max_tokens):
+        estimate = estimate_tokens(messages, max_tokens)
+        if self._budget is not None:
+            await self._budget.acquire(estimate)
+        return estimate
+
+    def _refund(self, estimate):
+        if self._budget is not None:
+            self._budget.refund(estimate)
+
+    def _settle(self, estimate, usage):
+        # Give back whatever the reservation over-estimated
+        if self._budget is not None and usage:
+            unused = estimate - usage["total_tokens"]
+            if unused > 0:
+                self._budget.refund(unused)
+
+    async def _complete_once(self, messages, model, max_tokens, temperature):
+        estimate = await self._reserve(messages, max_tokens)
+        try:
+            async with self._semaphore:
+                self.stats["upstream_calls"] += 1
+                response = await self._client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
+        except BaseException:
+            # A failed or rate-limited attempt used no tokens; give the reservation
+            # back before _with_retries reserves again for the next attempt
+            self._refund(estimate)
+            raise
+        usage = None
+        if response.usage:
+            usage = {
+                "prompt_tokens": response.usage.prompt_tokens,
+                "completion_tokens": response.usage.completion_tokens,
+                "total_tokens": response.usage.total_tokens
+            }
+        self._settle(estimate, usage)
+        return {"content": response.choices[0].message.content, "usage": usage or {}}
+
+    async def _astream(self, messages, items, model, max_tokens, temperature):
+        start = time.perf_counter()
+        usage = None
+        estimate = 0
+        outcome = "error"
+        with TRACER.span("llm.stream", model=model, max_tokens=max_tokens) as span:
+            try:
+                estimate = await self._reserve(messages, max_tokens)
+                async with self._semaphore:
+                    # Only opening the stream is retried; once tokens have been shown they can't be taken back
+                    async def open_stream():
+                        self.stats["upstream_calls"] += 1
+                        return await self._client.chat.completions.create(
+                            model=model,
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            stream=True,
+                            stream_options={"include_usage": True}
+                        )
+
+                    self.stats["requests"] += 1
+                    try:
+                        stream = await self._with_retries(open_stream, span)
+                    except BaseException:
+                        # The stream never opened, so none of the reservation was used
+                        self._refund(estimate)
+                        estimate = 0
+                        raise
+                    first_token = True
+                    try:
+                        async for chunk in stream:
+                            if getattr(chunk, "usage", None):
+                                usage = {
+                                    "prompt_tokens": chunk.usage.prompt_tokens,
+                                    "completion_tokens": chunk.usage.completion_tokens,
+                                    "total_tokens": chunk.usage.total_tokens
+                                }
+                                items.put(("usage", usage))
+                            if not chunk.choices:
+                                continue
+                            delta = chunk.choices[0].delta.content
+                            if not delta:
+                                continue
+                            if first_token:
+                                first_token = False
+                                ttft = time.perf_counter() - start
+                                logger.info("Time to first token: %.1fms", ttft * 1000)
+                                if RECORDER.enabled:
+                                    RECORDER.record("chat_ttft", ttft)
+                                LLM_FIRST_TOKEN_SECONDS.observe(ttft)
+                                span["first_token_ms"] = round(ttft * 1000, 1)
+                            items.put(("delta", delta))
+                        outcome = "ok"
+                    finally:
+                        await stream.close()
+            except asyncio.CancelledError:
+                # The reader closed the stream early
+                outcome = "cancelled"
+                raise
+            except Exception as e:
+                items.put(("error", e))
+                span.status = "error"
+                span["error"] = type(e).__name__
+            finally:
+                self._settle(estimate, usage)
+                items.put(("done", None))
+                LLM_SECONDS.labels("stream").observe(time.perf_counter() - start)
+                LLM_REQUESTS.labels("stream", outcome).inc()
+                record_usage(span, usage)
+
+    def close(self):
+        """Close the connection pool and stop the loop thread. Safe to call more than once."""
+        if not self._thread.is_alive():
+            return
+        asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
@@ -0,0 +1,356 @@
+"""Prometheus-style counters and histograms, plus lightweight trace spans.
+
+Metrics live in one process-wide registry (METRICS) and are exported in
+the Prometheus text format:
+
+    CARBON_CALC_METRICS_PORT=9464   serve them at http://127.0.0.1:9464/metrics
+    CARBON_CALC_METRICS_FILE=path   rewrite a file every CARBON_CALC_METRICS_INTERVAL
+                                    seconds (for node_exporter's textfile collector)
+
+The headless API also serves them at GET /metrics. Spans (TRACER) keep the
+most recent finished operations in memory; set CARBON_CALC_TRACE_FILE to
+also append each one as a JSON line.
+
+Each metric takes one short lock per update. Hot paths resolve their label
+values once (`counter.labels("hit")`) and keep the child.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from file_utils import write_atomic
+
+logger = logging.getLogger("carbon_calculator.metrics")
+
+# Upper bounds in seconds, from a fast calculation up to a slow LLM reply
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterValue:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class _Timer:
+    # A plain class rather than @contextmanager: about half the cost per use
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The child for one combination of label values (created on first use)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        # Copy first: labels() may add a child from another thread while this sorts
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children, key=lambda item: item[0]):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _render_child(self, values, child):
+        yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _render_child(self, values, child):
+        counts, total = child.snapshot()
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, [("le", _format_value(float(bound)))])
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {_format_value(total)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """A named set of metrics with Prometheus text exposition."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._exporters = {}
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the current values to `path` atomically."""
+        write_atomic(path, lambda f: f.write(self.render().encode("utf-8")))
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics from a daemon thread (idempotent per port). Returns the server."""
+        with self._lock:
+            server = self._exporters.get(("serve", host, port))
+            if server is None:
+                server = ThreadingHTTPServer((host, port), _metrics_handler(self))
+                server.daemon_threads = True
+                threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+                self._exporters[("serve", host, port)] = server
+        return server
+
+    def write_every(self, path, interval=15.0):
+        """Rewrite `path` from a daemon thread every `interval` seconds (idempotent per path)."""
+        with self._lock:
+            if ("file", path) in self._exporters:
+                return
+            thread = threading.Thread(target=self._write_loop, args=(path, interval), name="metrics-writer", daemon=True)
+            self._exporters[("file", path)] = thread
+            thread.start()
+
+    def _write_loop(self, path, interval):
+        while True:
+            try:
+                self.write(path)
+            except OSError as e:
+                logger.error("Could not write metrics to %s: %s", path, e)
+            time.sleep(interval)
+
+    def start_exporters(self):
+        """Start whichever exporters the CARBON_CALC_METRICS_* variables ask for."""
+        port = os.environ.get("CARBON_CALC_METRICS_PORT")
+        if port:
+            self.serve(int(port), os.environ.get("CARBON_CALC_METRICS_HOST", "127.0.0.1"))
+        path = os.environ.get("CARBON_CALC_METRICS_FILE")
+        if path:
+            self.write_every(path, float(os.environ.get("CARBON_CALC_METRICS_INTERVAL", 15.0)))
+
+
+def _metrics_handler(registry):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+class Span:
+    """One timed operation. Set attributes with span["key"] = value while it runs."""
+
+    __slots__ = ("name", "span_id", "start", "duration", "status", "attributes")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.attributes = attributes
+
+    def __setitem__(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+class Tracer:
+    """Keeps the most recent finished spans, optionally appending them to a JSON-lines file."""
+
+    def __init__(self, path=None, max_spans=1000):
+        self.path = path
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = Span(name, attributes)
+        start = time.perf_counter()
+        try:
+            yield span
+        except (asyncio.CancelledError, GeneratorExit):
+            span.status = "cancelled"
+            raise
+        except BaseException as e:
+            span.status = "error"
+            span.attributes.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            self._finish(span)
+
+    def _finish(self, span):
+        self.spans.append(span)
+        if self.path:
+            line = json.dumps(span.to_dict(), default=str) + "\n"
+            with self._lock:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(line)
+                except OSError as e:
+                    logger.error("Could not write span to %s: %s", self.path, e)
+
+    def recent(self, name=None):
+        return [span.to_dict() for span in list(self.spans) if name is None or span.name == name]
+
+
+METRICS = Registry()
+TRACER = Tracer(os.environ.get("CARBON_CALC_TRACE_FILE") or None)
+
+CALCULATIONS = METRICS.counter(
+    "carbon_calc_calculations_total", "Footprints calculated for users, by entry point", ["source"])
+CALCULATION_SECONDS = METRICS.histogram(
+    "carbon_calc_calculation_seconds", "Time to calculate footprints, per request", ["source"])
+RESPONSE_CACHE_LOOKUPS = METRICS.counter(
+    "carbon_calc_response_cache_lookups_total", "Chat response cache lookups", ["result"])
+LLM_REQUESTS = METRICS.counter(
+    "carbon_calc_llm_requests_total", "Upstream LLM calls, by call type and outcome", ["call", "outcome"])
+LLM_RETRIES = METRICS.counter(
+    "carbon_calc_llm_retries_total", "Retried upstream LLM calls")
+LLM_SECONDS = METRICS.histogram(
+    "carbon_calc_llm_request_seconds", "Upstream LLM call latency including retries", ["call"])
+LLM_FIRST_TOKEN_SECONDS = METRICS.histogram(
+    "carbon_calc_llm_first_token_seconds", "Time to the first streamed token")
+LLM_TOKENS = METRICS.counter(
+    "carbon_calc_llm_tokens_total", "Tokens reported by the LLM API", ["kind"])
+CHAT_FALLBACKS = METRICS.counter(
+    "carbon_calc_chat_fallbacks_total", "Chat replies not served by the LLM", ["reason"])
+KNOWLEDGE_ANSWERS = METRICS.counter(
+    "carbon_calc_knowledge_answers_total", "Chat questions answered from the knowledge base without an LLM call")
@@ -0,0 +1,151 @@
+"""A tiny local stand-in for the OpenAI chat completions API.
+
+Point the app (or a benchmark) at it with OPENAI_BASE_URL:
+
+    python mock_openai_server.py --port 8901 --latency 0.3 --token-delay 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8901/v1 OPENAI_API_KEY=test streamlit run app.py
+
+Supports plain JSON responses and `stream=True` server-sent events,
+including the final usage chunk when `stream_options.include_usage` is set.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "To cut transportation emissions, try public transit, carpooling or cycling for short trips, "
+    "and combine errands so you drive less."
+)
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Overridden per server by make_server
+    latency = 0.0
+    token_delay = 0.0
+    error_rate = 0.0
+    reply = DEFAULT_REPLY
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.request_count += 1
+
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+        tokens = [word + " " for word in self.reply.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens)
+        }
+        base = {
+            "id": f"chatcmpl-mock-{self.server.request_count}",
+            "created": int(time.time()),
+            "model": request.get("model", "mock")
+        }
+
+        time.sleep(self.latency)
+
+        if self.error_rate and random.random() < self.error_rate:
+            # Simulate the API shedding load
+            self.server.error_count += 1
+            body = json.dumps({"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if not request.get("stream"):
+            body = json.dumps(dict(base, object="chat.completion", usage=usage, choices=[{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop"
+            }])).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(payload):
+            self.wfile.write(f"data: {payload}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            chunk = dict(base, object="chat.completion.chunk")
+            send(json.dumps(dict(chunk, choices=[{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])))
+            for token in tokens:
+                if self.token_delay:
+                    time.sleep(self.token_delay)
+                send(json.dumps(dict(chunk, choices=[{"index": 0, "delta": {"content": token}, "finish_reason": None}])))
+            send(json.dumps(dict(chunk, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                send(json.dumps(dict(chunk, choices=[], usage=usage)))
+            send("[DONE]")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the stream
+            self.server.cancelled_count += 1
+
+
+def make_server(host="127.0.0.1", port=0, latency=0.0, token_delay=0.0, error_rate=0.0, reply=DEFAULT_REPLY):
+    handler = type("Handler", (MockOpenAIHandler,), {
+        "latency": latency, "token_delay": token_delay, "error_rate": error_rate, "reply": reply
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.request_count = 0
+    server.cancelled_count = 0
+    server.error_count = 0
+    return server
+
+
+def start_server(**kwargs):
+    """Start a mock server on a background thread and return (server, base_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local mock OpenAI chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first byte")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 429")
+    parser.add_argument("--reply", default=DEFAULT_REPLY, help="text every completion returns")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.latency, args.token_delay, args.error_rate, args.reply)
+    print(f"Mock OpenAI server on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import RESPONSE_CACHE_LOOKUPS
+
+_HITS = RESPONSE_CACHE_LOOKUPS.labels("hit")
+_MISSES = RESPONSE_CACHE_LOOKUPS.labels("miss")
+
+# Width of the total-emissions bands used in cache keys (tonnes CO2/year)
+EMISSIONS_BAND_WIDTH = 2.0
+
+# Part of every key, so answers stored under an older key scheme are never served
+KEY_VERSION = 2
+
+# Questions about the user's own figures are answered from their exact numbers,
+# which other users in the same band don't share
+_PERSONAL_WORDS = frozenset({"my", "mine", "our", "ours"})
+
+
+def normalize_question(text):
+    # Lowercase, drop punctuation and collapse whitespace so trivially
+    # different phrasings of the same question share a key
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def profile_bucket(user_data):
+    if not user_data or not user_data.get("calculated"):
+        return "no-profile"
+    band = int(user_data["total_emissions"] // EMISSIONS_BAND_WIDTH)
+    return f"{user_data['country']}|{user_data['highest_category']}|{band}"
+
+
+def make_key(messages, user_data=None):
+    """Cache key for the reply to the last of `messages`, or None if it shouldn't be cached.
+
+    Only the first question of a conversation is cached, keyed together
+    with the assistant message it follows: a follow-up like "tell me more"
+    or "yes" means something different in every conversation.
+    """
+    if not messages or messages[-1]["role"] != "user":
+        return None
+    if any(message["role"] == "user" for message in messages[:-1]):
+        return None
+    question = normalize_question(messages[-1]["content"])
+    if user_data and user_data.get("calculated") and not _PERSONAL_WORDS.isdisjoint(question.split()):
+        return None
+    previous = next((m["content"] for m in reversed(messages[:-1]) if m["role"] == "assistant"), "")
+    raw = "\n".join((f"v{KEY_VERSION}", question, profile_bucket(user_data),
+                     hashlib.sha256(previous.encode("utf-8")).hexdigest()))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of assistant answers, persisted to SQLite.
+
+    A small in-memory LRU sits in front of the database so repeat hits
+    never touch disk; the database keeps answers across restarts.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_entries=10000, memory_entries=1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, tokens INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            from_disk = entry is None
+            if from_disk:
+                entry = self._db.execute(
+                    "SELECT response, tokens, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if entry is not None and now - entry[2] > self.ttl:
+                self._memory.pop(key, None)
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                _MISSES.inc()
+                return None
+
+            self._remember(key, entry)
+            if from_disk:
+                # Memory hits skip the write; the on-disk LRU order is refreshed
+                # whenever an entry is promoted back into memory
+                self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            self.hits += 1
+            _HITS.inc()
+            self.tokens_saved += entry[1]
+            return entry[0]
+
+    def put(self, key, response, tokens=0):
+        now = time.time()
+        with self._lock:
+            self._remember(key, (response, tokens, now))
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, tokens, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, tokens, now, now)
+            )
+            # Evict least recently used rows beyond the cap
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tokens_saved": self.tokens_saved
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
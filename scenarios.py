@@ -0,0 +1,133 @@
+from functools import lru_cache
+
+import numpy as np
+
+from carbon_engine import current_table, calculate_batch
+from factor_table import CATEGORIES, DIET, ELECTRICITY, TRANSPORTATION, WASTE
+
+# Fractional cuts tried for each quantity lever (0 = keep the current value)
+CUTS = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5)
+
+# Cut shown as the headline tip for each quantity lever
+TIP_CUT = 0.2
+
+_CUTS = np.asarray(CUTS)
+
+
+@lru_cache(maxsize=4)
+def _grid(table):
+    """Grid axes and flattened lever indices for a factor table.
+
+    Axes, in order: transport mode, diet, distance cut, electricity cut,
+    waste cut. Cached per table, so this only reruns after a factor swap.
+    """
+    axes = (len(table.modes), len(table.diets), len(CUTS), len(CUTS), len(CUTS))
+    return axes, np.indices(axes).reshape(len(axes), -1), _lever_changes(table)
+
+
+def _lever_changes(table):
+    """(description, category, grid changes) for every single-lever tip."""
+    changes = []
+    for mode_id, mode in enumerate(table.modes.labels):
+        changes.append((f"Switch your commute to {mode}", CATEGORIES[TRANSPORTATION], {0: mode_id}))
+    for diet_id, diet in enumerate(table.diets.labels):
+        changes.append((f"Move to a {diet} diet", CATEGORIES[DIET], {1: diet_id}))
+    cut = CUTS.index(TIP_CUT)
+    percent = round(TIP_CUT * 100)
+    changes.append((f"Travel {percent}% fewer kilometres each day", CATEGORIES[TRANSPORTATION], {2: cut}))
+    changes.append((f"Cut your electricity use by {percent}%", CATEGORIES[ELECTRICITY], {3: cut}))
+    changes.append((f"Cut the waste you throw away by {percent}%", CATEGORIES[WASTE], {4: cut}))
+    return changes
+
+
+class ScenarioSweep:
+    """Every combination of the tip levers, scored in one calculate_batch call.
+
+    The grid crosses each transport mode and diet with each cut in CUTS
+    applied to distance, electricity and waste (2,592 scenarios with the
+    current factor table). Scenario indices are flat positions in that grid,
+    so a combination of levers is found by index arithmetic rather than a
+    search.
+    """
+
+    def __init__(self, country, transportation_mode, distance, electricity,
+                 diet_type, meals, waste, household_size, table=None):
+        table = table or current_table()
+        self.axes, grid, self.levers = _grid(table)
+        self.baseline = (
+            table.modes.encode_one(transportation_mode),
+            table.diets.encode_one(diet_type),
+            0, 0, 0
+        )
+        modes, diets, distance_cuts, electricity_cuts, waste_cuts = grid
+        n = grid.shape[1]
+        self.results = calculate_batch(
+            np.full(n, table.countries.encode_one(country)),
+            modes,
+            distance * (1 - _CUTS[distance_cuts]),
+            electricity * (1 - _CUTS[electricity_cuts]),
+            diets,
+            np.full(n, meals),
+            waste * (1 - _CUTS[waste_cuts]),
+            np.full(n, household_size),
+            table=table
+        )
+        self.totals = self.results["total_emissions"]
+        self.baseline_total = self.totals[self.index(self.baseline)]
+
+    def __len__(self):
+        return len(self.totals)
+
+    def index(self, levers):
+        return int(np.ravel_multi_index(levers, self.axes))
+
+    def combine(self, *changes):
+        """Flat index of the baseline with every lever change in `changes` applied."""
+        levers = list(self.baseline)
+        for change in changes:
+            for axis, value in change.items():
+                levers[axis] = value
+        return self.index(levers)
+
+    def saved(self, index):
+        return round(float(self.baseline_total - self.totals[index]), 2)
+
+    def tips(self, top=None):
+        """Single-lever tips that lower the total, largest saving first.
+
+        Each is a dict with description, category, saved and new_total
+        (tonnes CO2/year) and the lever change, for passing back to combine().
+        """
+        ranked = []
+        for description, category, change in self.levers:
+            index = self.combine(change)
+            saved = self.saved(index)
+            if saved > 0:
+                ranked.append({
+                    "description": description,
+                    "category": category,
+                    "saved": saved,
+                    "new_total": float(self.totals[index]),
+                    "change": change
+                })
+        # Stable sort keeps lever order on equal savings
+        ranked.sort(key=lambda tip: -tip["saved"])
+        return ranked if top is None else ranked[:top]
+
+    def combined_saving(self, tips):
+        """Tonnes saved by following all of `tips` together.
+
+        Tips that change the same lever are alternatives, so only the first
+        of them (the larger saving, for ranked tips) is applied.
+        """
+        changes, axes = [], set()
+        for tip in tips:
+            if not axes.intersection(tip["change"]):
+                axes.update(tip["change"])
+                changes.append(tip["change"])
+        return self.saved(self.combine(*changes))
+
+
+def rank_tips(inputs, top=5):
+    """Ranked tips for a dict of Calculator inputs (see carbon_engine.INPUT_COLUMNS)."""
+    return ScenarioSweep(**inputs).tips(top)
@@ -0,0 +1,144 @@
+import json
+import os
+import time
+import uuid
+import weakref
+from dataclasses import dataclass
+
+# Where chat history beyond the in-memory cap is spilled, one file per session.
+# Only this app's user can read it: the directory is 0700 and the files 0600.
+SPILL_DIR = os.environ.get("CARBON_CALC_SPILL_DIR", os.path.join(".cache", "sessions"))
+
+# Spill files older than this are left over from sessions that never ended cleanly
+SPILL_TTL = float(os.environ.get("CARBON_CALC_SPILL_TTL", 24 * 3600))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def sweep_spill_files(spill_dir=SPILL_DIR, max_age=SPILL_TTL):
+    """Delete spill files not written to for max_age seconds; returns how many were removed."""
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        entries = list(os.scandir(spill_dir))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if entry.name.endswith(".jsonl") and entry.is_file() and entry.stat().st_mtime < cutoff:
+            _remove(entry.path)
+            removed += 1
+    return removed
+
+
+@dataclass(slots=True)
+class FootprintResult:
+    """One calculation's results, stored in session state as a single compact object."""
+
+    total_emissions: float
+    transportation_emissions: float
+    electricity_emissions: float
+    diet_emissions: float
+    waste_emissions: float
+    country: str
+    highest_category: str
+    factors_version: str = None
+
+    @classmethod
+    def from_results(cls, results, country):
+        return cls(
+            results["total_emissions"],
+            results["transportation_emissions"],
+            results["electricity_emissions"],
+            results["diet_emissions"],
+            results["waste_emissions"],
+            country,
+            results["highest_category"],
+            results.get("factors_version")
+        )
+
+    def category_emissions(self):
+        return {
+            "Transportation": self.transportation_emissions,
+            "Electricity": self.electricity_emissions,
+            "Diet": self.diet_emissions,
+            "Waste": self.waste_emissions
+        }
+
+    def to_user_data(self):
+        # The dict shape the chat context, response cache and fallback replies read
+        return {
+            "calculated": True,
+            "total_emissions": self.total_emissions,
+            "transportation_emissions": self.transportation_emissions,
+            "electricity_emissions": self.electricity_emissions,
+            "diet_emissions": self.diet_emissions,
+            "waste_emissions": self.waste_emissions,
+            "country": self.country,
+            "highest_category": self.highest_category
+        }
+
+
+class MessageLog(list):
+    """Chat messages held as a bounded ring buffer.
+
+    Behaves like the plain list it replaces, but once more than `cap`
+    messages are held the oldest are appended to a per-session JSONL file
+    on disk and dropped from memory. `tail(n)` reads them back when the
+    user pages through old history. The file is deleted when the log is
+    cleared or garbage collected with its session.
+    """
+
+    def __init__(self, messages=(), cap=200, spill_dir=SPILL_DIR):
+        super().__init__()
+        self.cap = cap
+        self.spilled = 0
+        self.spill_path = os.path.join(spill_dir, f"{uuid.uuid4().hex}.jsonl")
+        self._finalizer = weakref.finalize(self, _remove, self.spill_path)
+        for message in messages:
+            self.append(message)
+
+    @property
+    def total(self):
+        # Messages in the whole conversation, including those spilled to disk
+        return len(self) + self.spilled
+
+    def append(self, message):
+        super().append(message)
+        overflow = len(self) - self.cap
+        if overflow > 0:
+            # Spill in batches so the file isn't reopened on every message
+            self._spill(max(overflow, self.cap // 4))
+
+    def _spill(self, count):
+        os.makedirs(os.path.dirname(self.spill_path), mode=0o700, exist_ok=True)
+        fd = os.open(self.spill_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        with open(fd, "a", encoding="utf-8") as f:
+            for message in self[:count]:
+                f.write(json.dumps(message) + "\n")
+        del self[:count]
+        self.spilled += count
+
+    def tail(self, n):
+        """Return the newest n messages, reading spilled ones back from disk if needed."""
+        in_memory = list(self)
+        if n <= len(in_memory):
+            return in_memory[len(in_memory) - n:]
+        older = []
+        if self.spilled:
+            with open(self.spill_path, encoding="utf-8") as f:
+                older = [json.loads(line) for line in f]
+        return older[max(0, len(older) - (n - len(in_memory))):] + in_memory
+
+    def clear(self):
+        super().clear()
+        self.discard()
+
+    def discard(self):
+        """Delete the spilled history from disk."""
+        _remove(self.spill_path)
+        self.spilled = 0
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app's modules live at the repository root; the benchmark helpers some tests reuse live in benchmarks/
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
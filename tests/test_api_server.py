@@ -0,0 +1,89 @@
+import json
+from concurrent.futures import Future
+
+import pytest
+from starlette.testclient import TestClient
+
+from api_server import create_app
+from carbon_engine import calculate_footprint
+
+INPUTS = {"country": "India", "transportation_mode": "Car", "distance": 10, "electricity": 200,
+          "diet_type": "Vegan", "meals": 3, "waste": 5, "household_size": 3}
+
+
+@pytest.fixture
+def client():
+    return TestClient(create_app())
+
+
+def columns(rows):
+    return {field: [row[field] for row in rows] for field in INPUTS}
+
+
+def test_footprint(client):
+    response = client.post("/v1/footprint", json=INPUTS)
+    assert response.status_code == 200
+    assert response.json()["total_emissions"] == calculate_footprint(**INPUTS)["total_emissions"]
+
+
+def test_batch_rows_and_columns_match_single_results(client):
+    rows = [INPUTS, dict(INPUTS, transportation_mode="Public Transit", household_size=1)]
+    expected = [calculate_footprint(**row)["total_emissions"] for row in rows]
+
+    by_rows = client.post("/v1/footprint/batch", json={"rows": rows}).json()
+    assert [result["total_emissions"] for result in by_rows["results"]] == expected
+
+    by_columns = client.post("/v1/footprint/batch", json={"columns": columns(rows)}).json()
+    assert by_columns["results"]["total_emissions"] == expected
+
+
+@pytest.mark.parametrize("change", [
+    {"country": ["India"]},
+    {"country": 0},
+    {"country": "Atlantis"},
+    {"transportation_mode": "Rocket"},
+    {"transportation_mode": ["Car"]},
+    {"diet_type": 1},
+    {"distance": "10"},
+    {"meals": True},
+    {"household_size": 0}
+])
+def test_bad_inputs_are_rejected_by_both_endpoints(client, change):
+    bad = dict(INPUTS, **change)
+    assert client.post("/v1/footprint", json=bad).status_code == 400
+    for body in ({"rows": [INPUTS, bad]}, {"columns": columns([INPUTS, bad])}):
+        response = client.post("/v1/footprint/batch", json=body)
+        assert response.status_code == 400
+        assert response.json()["error"].startswith("Row 1")
+
+
+def test_missing_transportation_mode_is_not_scored_as_car(client):
+    row = {field: value for field, value in INPUTS.items() if field != "transportation_mode"}
+    response = client.post("/v1/footprint/batch", json={"rows": [row]})
+    assert response.status_code == 400
+    assert "transportation_mode" in response.json()["error"]
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/v1/footprint", dict(INPUTS, distance=float("inf"))),
+    ("/v1/footprint/batch", {"rows": [dict(INPUTS, waste=float("nan"))]}),
+    ("/v1/footprint/batch", {"rows": [dict(INPUTS, distance=1e308)]})
+])
+def test_non_finite_inputs_and_results_are_rejected(client, path, body):
+    # json.dumps writes NaN and Infinity, which Python's JSON parser accepts
+    response = client.post(path, content=json.dumps(body), headers={"content-type": "application/json"})
+    assert response.status_code == 400
+
+
+class StubGateway:
+    def submit(self, messages):
+        future = Future()
+        future.set_result({"content": "Try the bus.", "usage": {"total_tokens": 10}})
+        return future
+
+
+def test_chat_without_a_response_cache():
+    client = TestClient(create_app(gateway=StubGateway()))
+    response = client.post("/v1/chat", json={"messages": [{"role": "user", "content": "zebras and quasars?"}]})
+    assert response.status_code == 200
+    assert response.json() == {"reply": "Try the bus.", "source": "llm"}
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from carbon_engine import INPUT_COLUMNS, RESULT_COLUMNS, calculate_batch, calculate_footprint, current_table, round2
+from factor_table import CATEGORIES
+
+
+def random_inputs(rng, n):
+    table = current_table()
+    # Whole and half numbers, as people type them, land on rounding ties far more often than uniform floats
+    return {
+        "country": rng.choice(table.countries.labels, n),
+        "transportation_mode": rng.choice(table.modes.labels, n),
+        "distance": np.where(rng.random(n) < 0.5, rng.integers(0, 200, n) / 2, rng.uniform(0, 150, n)),
+        "electricity": np.where(rng.random(n) < 0.5, rng.integers(0, 1000, n), rng.uniform(0, 1500, n)),
+        "diet_type": rng.choice(table.diets.labels, n),
+        "meals": rng.integers(1, 6, n),
+        "waste": np.where(rng.random(n) < 0.5, rng.integers(0, 40, n) / 2, rng.uniform(0, 30, n)),
+        "household_size": rng.integers(1, 9, n)
+    }
+
+
+def test_round2_matches_round_on_ties():
+    # Every k/200 is a decimal tie at the third place; the neighbours test the tie window's edges
+    ties = np.arange(0, 40_000) / 200
+    values = np.concatenate([ties, np.nextafter(ties, np.inf), np.nextafter(ties, -np.inf),
+                             [0.125, 0.375, 1.005, 2.675, 0.285, 1.115, 8.345]])
+    expected = [round(float(value), 2) for value in values]
+    assert round2(values).tolist() == expected
+
+
+def test_round2_matches_round_on_random_values():
+    rng = np.random.default_rng(1)
+    values = np.concatenate([rng.uniform(0, 1, 50_000), rng.uniform(0, 100, 50_000), rng.exponential(5, 50_000)])
+    assert round2(values).tolist() == [round(float(value), 2) for value in values]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_batch_matches_per_user_results(seed):
+    n = 20_000
+    columns = random_inputs(np.random.default_rng(seed), n)
+    batch = calculate_batch(*columns.values())
+
+    for i in range(n):
+        row = {field: values[i].item() for field, values in columns.items()}
+        expected = calculate_footprint(**row)
+        got = {column: batch[column][i].item() for column in RESULT_COLUMNS}
+        assert got == {column: expected[column] for column in RESULT_COLUMNS}, row
+        assert CATEGORIES[batch["highest_category"][i]] == expected["highest_category"], row
+    assert batch["factors_version"] == current_table().version
+
+
+def test_batch_accepts_integer_codes():
+    table = current_table()
+    labels = {"country": ["India"], "transportation_mode": ["Car"], "diet_type": ["Vegan"]}
+    codes = {"country": [table.countries.ids["India"]], "transportation_mode": [table.modes.ids["Car"]],
+             "diet_type": [table.diets.ids["Vegan"]]}
+    numbers = {"distance": [10.0], "electricity": [200.0], "meals": [3], "waste": [5.0], "household_size": [3]}
+    by_label = calculate_batch(*({**labels, **numbers}[field] for field in INPUT_COLUMNS))
+    by_code = calculate_batch(*({**codes, **numbers}[field] for field in INPUT_COLUMNS))
+    assert by_label["total_emissions"].tolist() == by_code["total_emissions"].tolist()
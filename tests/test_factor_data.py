@@ -0,0 +1,41 @@
+import json
+import logging
+
+import numpy as np
+
+from factor_data import DEFAULT_FACTORS_PATH, load_factor_table
+
+
+def test_cached_table_matches_the_parsed_one(tmp_path):
+    first = load_factor_table(DEFAULT_FACTORS_PATH, str(tmp_path))
+    cached = load_factor_table(DEFAULT_FACTORS_PATH, str(tmp_path))
+    assert isinstance(cached.factors, np.memmap)
+    assert cached.version == first.version
+    np.testing.assert_array_equal(cached.factors, first.factors)
+
+
+def test_changed_file_gets_its_own_cache_entry(tmp_path):
+    with open(DEFAULT_FACTORS_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    path = tmp_path / "factors.json"
+    path.write_text(json.dumps(data))
+    cache_dir = str(tmp_path / "cache")
+    original = load_factor_table(str(path), cache_dir)
+
+    data["version"] = "test-2"
+    path.write_text(json.dumps(data))
+    assert load_factor_table(str(path), cache_dir).version == "test-2"
+
+    # Rolling back loads the original compiled entry again
+    path.write_text(json.dumps(dict(data, version=original.version)))
+    assert load_factor_table(str(path), cache_dir).version == original.version
+
+
+def test_unwritable_cache_falls_back_to_memory(tmp_path, caplog):
+    blocker = tmp_path / "not-a-directory"
+    blocker.write_text("")
+    with caplog.at_level(logging.WARNING, logger="carbon_calculator.factors"):
+        table = load_factor_table(DEFAULT_FACTORS_PATH, str(blocker / "factors"))
+    assert not isinstance(table.factors, np.memmap)
+    assert table.countries.labels
+    assert "Could not cache compiled factors" in caplog.text
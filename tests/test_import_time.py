@@ -0,0 +1,21 @@
+import os
+
+import pytest
+
+from import_time import DEFERRED_MODULES, ROOT, measure, startup_imports
+
+
+@pytest.fixture(scope="module")
+def startup_modules():
+    # One fresh interpreter running app.py's top-level imports, as a new pod would
+    return {row[0] for row in measure(startup_imports(os.path.join(ROOT, "app.py")))}
+
+
+@pytest.mark.parametrize("module", sorted({"openai", "pandas", "llm_gateway", *DEFERRED_MODULES}))
+def test_app_startup_does_not_import(startup_modules, module):
+    assert module not in startup_modules
+
+
+def test_startup_imports_are_measured(startup_modules):
+    # Guards against the check passing because nothing was imported at all
+    assert {"streamlit", "numpy", "carbon_engine"} <= startup_modules
@@ -0,0 +1,45 @@
+import pytest
+
+from intent_bench import load_corpus
+from intent_router import ROUTER, IntentRouter, tokenize
+
+
+def test_labelled_corpus_accuracy():
+    corpus = load_corpus()
+    misses = [example for example in corpus if ROUTER.route(example["text"])[0] != example["intent"]]
+    assert len(misses) / len(corpus) <= 0.05, misses
+
+
+@pytest.mark.parametrize("text, intent", [
+    # Whole tokens only: "carbon" is not "car", "which" is not "hi"
+    ("What is my carbon score?", "total"),
+    ("which one is better", None),
+    ("Thanks for the help with my diet!", "diet"),
+    ("Is public transit worth it?", "transportation"),
+    ("Is a plant based diet better?", "diet"),
+    ("Tell me about the weather", None)
+])
+def test_route(text, intent):
+    assert ROUTER.route(text)[0] == intent
+
+
+def test_phrases_outscore_their_words():
+    router = IntentRouter({"a": {"air": 0.4, "air conditioning": 1.2}, "b": {"conditioning": 1.0}})
+    assert router.route("AIR-CONDITIONING at night") == ("a", pytest.approx(1.6))
+
+
+def test_ties_go_to_the_earlier_intent():
+    router = IntentRouter({"first": {"x": 1.0}, "second": {"y": 1.0}})
+    assert router.route("y x")[0] == "first"
+    assert router.route("x y")[0] == "first"
+
+
+def test_thresholds():
+    router = IntentRouter({"a": {"x": 0.4, "z": 1.0}, "b": {"y": 0.9}}, min_score=0.5, min_margin=0.2)
+    assert router.route("x") == (None, 0.4)
+    assert router.route("z y")[0] is None
+    assert router.route("z")[0] == "a"
+
+
+def test_tokenize():
+    assert tokenize("How's my CO2, per-km?") == ["how", "s", "my", "co2", "per", "km"]
@@ -0,0 +1,51 @@
+from response_cache import ResponseCache, make_key
+
+GREETING = {"role": "assistant", "content": "Hi! Ask me anything about your footprint."}
+PROFILE = {"calculated": True, "total_emissions": 7.4, "country": "India", "highest_category": "Transportation"}
+
+
+def user(text):
+    return {"role": "user", "content": text}
+
+
+def test_first_question_is_cached_across_phrasings():
+    key = make_key([GREETING, user("How can I reduce transport emissions?")], PROFILE)
+    assert key is not None
+    assert make_key([GREETING, user("how can i reduce  transport emissions")], PROFILE) == key
+
+
+def test_follow_ups_are_not_cached():
+    messages = [GREETING, user("How can I reduce transport emissions?"),
+                {"role": "assistant", "content": "Take the bus."}, user("tell me more")]
+    assert make_key(messages, PROFILE) is None
+
+
+def test_key_depends_on_the_assistant_message_answered():
+    above = {"role": "assistant", "content": "Your total is above average. Would you like tips?"}
+    below = {"role": "assistant", "content": "Your total is below average. Would you like tips?"}
+    assert make_key([above, user("yes")], PROFILE) != make_key([below, user("yes")], PROFILE)
+
+
+def test_questions_about_the_users_own_figures_are_not_cached():
+    assert make_key([GREETING, user("Why is my total so high?")], PROFILE) is None
+    # Before a calculation there are no personal figures to leak
+    assert make_key([GREETING, user("Why is my total so high?")], {"calculated": False}) is not None
+
+
+def test_profiles_in_different_bands_do_not_share_answers():
+    question = [GREETING, user("How can I reduce transport emissions?")]
+    assert make_key(question, PROFILE) != make_key(question, dict(PROFILE, total_emissions=9.1))
+
+
+def test_cache_round_trip_survives_reopening(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    key = make_key([GREETING, user("What is a carbon footprint?")])
+    cache = ResponseCache(path)
+    assert cache.get(key) is None
+    cache.put(key, "An answer", tokens=12)
+    cache.close()
+
+    cache = ResponseCache(path)
+    assert cache.get(key) == "An answer"
+    assert cache.stats()["tokens_saved"] == 12
+    cache.close()
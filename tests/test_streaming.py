@@ -0,0 +1,65 @@
+import time
+from contextlib import closing
+
+import openai
+import pytest
+
+from llm_gateway import LLMGateway
+from mock_openai_server import DEFAULT_REPLY, start_server
+
+MESSAGES = [{"role": "user", "content": "How can I reduce my transportation emissions?"}]
+
+
+@pytest.fixture
+def mock_api():
+    """Starts mock OpenAI servers on demand; returns (server, base_url)."""
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_server(**kwargs)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def test_stream_yields_the_reply_token_by_token(mock_api):
+    _, base_url = mock_api()
+    gateway = LLMGateway(api_key="test", base_url=base_url)
+    usage = {}
+    deltas = list(gateway.stream(MESSAGES, usage=usage))
+
+    assert "".join(deltas) == DEFAULT_REPLY
+    assert len(deltas) == len(DEFAULT_REPLY.split(" "))
+    assert usage["completion_tokens"] == len(deltas)
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+
+
+def test_stream_matches_the_blocking_reply(mock_api):
+    _, base_url = mock_api()
+    gateway = LLMGateway(api_key="test", base_url=base_url)
+    assert "".join(gateway.stream(MESSAGES)) == gateway.complete(MESSAGES)["content"]
+
+
+def test_closing_the_stream_early_cancels_the_upstream_request(mock_api):
+    server, base_url = mock_api(token_delay=0.02)
+    gateway = LLMGateway(api_key="test", base_url=base_url)
+    with closing(gateway.stream(MESSAGES)) as deltas:
+        first = next(deltas)
+    assert DEFAULT_REPLY.startswith(first)
+
+    # The mock notices the dropped connection on its next write
+    deadline = time.monotonic() + 5
+    while server.cancelled_count == 0 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert server.cancelled_count == 1
+
+
+def test_stream_raises_once_retries_are_exhausted(mock_api):
+    server, base_url = mock_api(error_rate=1.0)
+    gateway = LLMGateway(api_key="test", base_url=base_url, max_retries=1, backoff_base=0.01)
+    with pytest.raises(openai.RateLimitError):
+        list(gateway.stream(MESSAGES))
+    assert server.request_count == 2
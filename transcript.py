@@ -0,0 +1,56 @@
+import html
+import itertools
+from datetime import datetime
+
+_message_ids = itertools.count(1)
+
+
+def new_message(role, content):
+    """Create a chat message with a process-unique id for fragment caching."""
+    return {"id": next(_message_ids), "role": role, "content": content, "time": datetime.now().strftime("%H:%M")}
+
+
+def render_message(message, cursor=""):
+    css_class = "user-message" if message["role"] == "user" else "bot-message"
+    # Escape user and model text so it can't inject markup into the page
+    content = html.escape(message["content"]).replace("\n", "<br>")
+    return f"<div class='{css_class}'>{content}{cursor}<div class='time-stamp'>{message['time']}</div></div>"
+
+
+class Transcript:
+    """Per-session renderer that builds each message's HTML fragment once.
+
+    Fragments are cached by message id (and content length, so a reply that
+    is still streaming is re-rendered as it grows). Only the newest
+    `visible` messages are rendered, so the cost per rerun stays flat no
+    matter how long the conversation gets; older history is paged in on
+    request.
+    """
+
+    def __init__(self, page_size=50):
+        self.page_size = page_size
+        self.visible = page_size
+        self._fragments = {}
+
+    def fragment(self, message):
+        cached = self._fragments.get(message["id"])
+        if cached is not None and cached[0] == len(message["content"]):
+            return cached[1]
+        fragment = render_message(message)
+        self._fragments[message["id"]] = (len(message["content"]), fragment)
+        return fragment
+
+    def hidden_count(self, total):
+        return max(0, total - self.visible)
+
+    def show_more(self):
+        self.visible += self.page_size
+
+    def html(self, messages):
+        """Render the newest `visible` of `messages` (a list or a MessageLog tail)."""
+        visible = messages[-self.visible:] if self.visible else []
+        if len(self._fragments) > 2 * self.visible and visible:
+            # Drop fragments that have scrolled out of the rendered page
+            oldest = visible[0]["id"]
+            self._fragments = {key: value for key, value in self._fragments.items() if key >= oldest}
+        return "".join(self.fragment(message) for message in visible)
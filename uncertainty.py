@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from carbon_engine import current_table
+from factor_table import CATEGORIES, DIET, ELECTRICITY, TRANSPORTATION, WASTE
+
+# Spread of every emission factor in each category, as the sigma of a
+# mean-preserving lognormal (roughly the relative standard deviation).
+# Diet and waste factors are coarse national averages, so they vary most.
+FACTOR_UNCERTAINTY = {
+    "Transportation": 0.15,
+    "Electricity": 0.10,
+    "Diet": 0.25,
+    "Waste": 0.30
+}
+
+# Spread of the user's own estimates; meals and household size are exact counts
+INPUT_UNCERTAINTY = {
+    "distance": 0.20,
+    "electricity": 0.10,
+    "waste": 0.30
+}
+
+INTERVAL_KEYS = CATEGORIES + ["Total"]
+
+_SIGMAS = np.array(
+    [FACTOR_UNCERTAINTY[category] for category in CATEGORIES]
+    + [INPUT_UNCERTAINTY[name] for name in ("distance", "electricity", "waste")],
+    dtype=np.float32
+)
+# Lognormal with mu = -sigma^2 / 2 has mean 1, so the noise doesn't bias the central estimate
+_MUS = -_SIGMAS ** 2 / 2
+
+
+def sample_footprint(country, transportation_mode, distance, electricity,
+                     diet_type, meals, waste, household_size, draws=100_000, rng=None, table=None):
+    """Draw `draws` yearly footprints (tonnes CO2) as a (5, draws) array.
+
+    Rows follow INTERVAL_KEYS: the four categories, then the total. The
+    formulas are calculate_footprint's, with every factor and estimated
+    input scaled by its own lognormal noise. Values are left unrounded and
+    kept in float32, which is ample for two-decimal intervals and makes
+    sampling noticeably faster.
+    """
+    rng = np.random.default_rng(rng)
+    table = table or current_table()
+    country_id = table.countries.encode_one(country)
+    diet_id = table.diets.encode_one(diet_type)
+    transport_multiplier = table.multiplier(table.modes.encode_one(transportation_mode))
+
+    # One call for all seven noise terms, transformed in place
+    noise = rng.standard_normal((len(_SIGMAS), draws), dtype=np.float32)
+    noise *= _SIGMAS[:, None]
+    noise += _MUS[:, None]
+    np.exp(noise, out=noise)
+    transport_noise, electricity_noise, diet_noise, waste_noise, distance_noise, kwh_noise, waste_input_noise = noise
+
+    samples = np.empty((len(INTERVAL_KEYS), draws), dtype=np.float32)
+    samples[TRANSPORTATION] = table.factor(country_id, TRANSPORTATION) * transport_noise \
+        * (distance * 365 * transport_multiplier / 1000) * distance_noise
+    samples[ELECTRICITY] = table.factor(country_id, ELECTRICITY) * electricity_noise \
+        * (electricity * 12 / household_size / 1000) * kwh_noise
+    samples[DIET] = table.factor(country_id, DIET, diet_id) * diet_noise * (meals * 365 / 1000)
+    samples[WASTE] = table.factor(country_id, WASTE) * waste_noise \
+        * (waste * 52 / household_size / 1000) * waste_input_noise
+    samples[-1] = samples[:-1].sum(axis=0)
+    return samples
+
+
+def footprint_intervals(country, transportation_mode, distance, electricity,
+                        diet_type, meals, waste, household_size,
+                        draws=100_000, confidence=0.9, seed=None, table=None):
+    """Monte Carlo confidence intervals for each category and the total.
+
+    Returns {key: {"mean", "low", "high"}} in tonnes CO2/year for each of
+    INTERVAL_KEYS, where low/high bound the central `confidence` share of
+    the draws. The same seed always gives the same intervals. `table`
+    defaults to the current factor table.
+    """
+    samples = sample_footprint(country, transportation_mode, distance, electricity,
+                               diet_type, meals, waste, household_size, draws, seed, table)
+    tail = (1 - confidence) / 2
+    low, high = np.quantile(samples, [tail, 1 - tail], axis=1)
+    means = samples.mean(axis=1, dtype=np.float64)
+    return {
+        key: {"mean": round(float(means[i]), 2), "low": round(float(low[i]), 2), "high": round(float(high[i]), 2)}
+        for i, key in enumerate(INTERVAL_KEYS)
+    }
+
+
+def _intervals_for_row(args):
+    inputs, draws, confidence, seed = args
+    return footprint_intervals(**inputs, draws=draws, confidence=confidence, seed=seed)
+
+
+def batch_intervals(rows, draws=100_000, confidence=0.9, seed=None, workers=None):
+    """footprint_intervals for each dict of inputs in `rows`, in order.
+
+    Each row gets its own child seed spawned from `seed`, so results are
+    reproducible and don't depend on the number of workers. With more
+    than one worker the rows are spread over a process pool.
+    """
+    rows = list(rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(rows))
+    jobs = [(inputs, draws, confidence, row_seed) for inputs, row_seed in zip(rows, seeds)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) < 2:
+        return [_intervals_for_row(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_intervals_for_row, jobs, chunksize=max(1, len(jobs) // (workers * 4))))